@@ -0,0 +1,119 @@
+"""
+Benchmark da leitura das planilhas: caminho antigo x leitura tipada por esquema.
+
+- antigo: o download inteiro em um BytesIO, pd.read_csv sem tipos, filtro de
+  linhas "total" e conversão numérica das colunas escolhidas por palavra-chave;
+- tipado: esquemas.ler_csv_tipado lendo em lotes direto do fluxo, com os tipos
+  do esquema da pasta (números, datas e categorias).
+
+Cada medição roda em um processo novo, para que o pico de memória residente
+(acima do início da leitura, amostrado de /proc) não herde a memória já reservada
+por uma medição anterior. Mostra também a memória ocupada pelo DataFrame final.
+
+Uso:
+    python benchmarks/benchmark_leitura.py
+    python benchmarks/benchmark_leitura.py --linhas 1000000 --pastas producao_diaria_geral
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_pipeline import MonitorMemoria
+from dados_sinteticos import LAYOUTS, para_csv
+
+from esquemas import esquema_da_pasta, ler_csv_tipado
+from normalizacao import remover_linhas_total, tratar_valores_numericos
+
+# Palavras que escolhiam as colunas numéricas de cada pasta antes dos esquemas
+PALAVRAS_ANTIGAS = {
+    "producao_diaria_geral": ("valor", "custo", "fatur"),
+    "producao_diaria_por_convenio": ("quant", "valor", "fatur"),
+    "extratos_bancarios": ("valor", "saldo", "mov"),
+    "orcamentos_nao_convertidos": ("valor", "desconto"),
+}
+
+
+# ---------------------- LEITURAS COMPARADAS ----------------------
+def ler_antigo(caminho, pasta):
+    import pandas as pd
+    with open(caminho, "rb") as arquivo:
+        conteudo = io.BytesIO(arquivo.read())
+    df = remover_linhas_total(pd.read_csv(conteudo, encoding="latin1", sep=";"))
+    colunas = [col for col in df.columns if any(p in col.lower() for p in PALAVRAS_ANTIGAS[pasta])]
+    return tratar_valores_numericos(df, colunas)
+
+
+def ler_tipado(caminho, pasta):
+    with open(caminho, "rb") as fluxo:
+        return ler_csv_tipado(fluxo, esquema_da_pasta(pasta))
+
+
+LEITURAS = {"antigo": ler_antigo, "tipado": ler_tipado}
+
+
+def medir(modo, caminho, pasta):
+    """
+    Executada no processo filho: lê o arquivo e imprime o resultado em JSON.
+    """
+    with MonitorMemoria() as memoria:
+        inicio = time.perf_counter()
+        df = LEITURAS[modo](caminho, pasta)
+        segundos = time.perf_counter() - inicio
+    print(json.dumps({
+        "segundos": round(segundos, 3),
+        "pico_memoria_mb": memoria.pico_mb,
+        "dataframe_mb": round(df.memory_usage(deep=True).sum() / 1024 / 1024, 1),
+        "linhas": len(df),
+    }))
+
+
+def medir_em_processo(modo, caminho, pasta):
+    saida = subprocess.run([sys.executable, os.path.abspath(__file__), "--medir", modo, caminho, pasta],
+                           check=True, capture_output=True, text=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+# ---------------------- COMPARAÇÃO ----------------------
+def executar(pastas, linhas, seed):
+    rng = np.random.default_rng(seed)
+    print(f"{'pasta':<30} {'MB':>7} | {'modo':<7} {'tempo (s)':>9} {'pico (MB)':>10} {'df (MB)':>8} {'linhas':>9}")
+    print("-" * 92)
+    with tempfile.TemporaryDirectory() as diretorio:
+        for pasta in pastas:
+            gerar = LAYOUTS[pasta][0]
+            caminho = os.path.join(diretorio, f"{pasta}.csv")
+            with open(caminho, "wb") as arquivo:
+                arquivo.write(para_csv(gerar(rng, linhas, date(2025, 3, 31)), rng))
+            tamanho = os.path.getsize(caminho) / 1024 / 1024
+            resultados = {modo: medir_em_processo(modo, caminho, pasta) for modo in LEITURAS}
+            for modo, resultado in resultados.items():
+                print(f"{pasta:<30} {tamanho:>7.1f} | {modo:<7} {resultado['segundos']:>9.2f} "
+                      f"{resultado['pico_memoria_mb']:>10} {resultado['dataframe_mb']:>8} {resultado['linhas']:>9}")
+            antigo, tipado = resultados["antigo"], resultados["tipado"]
+            if antigo["pico_memoria_mb"] and tipado["pico_memoria_mb"]:
+                print(f"{'':<30} {'':>7} | ganho: tempo {antigo['segundos'] / tipado['segundos']:.1f}x, "
+                      f"pico {antigo['pico_memoria_mb'] / tipado['pico_memoria_mb']:.1f}x, "
+                      f"DataFrame {antigo['dataframe_mb'] / tipado['dataframe_mb']:.1f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--medir":
+        medir(*sys.argv[2:])
+        sys.exit()
+    parser = argparse.ArgumentParser(description="Compara a leitura antiga dos CSVs com a leitura tipada por esquema.")
+    parser.add_argument("--pastas", nargs="+", choices=sorted(PALAVRAS_ANTIGAS),
+                        default=["producao_diaria_geral", "extratos_bancarios"])
+    parser.add_argument("--linhas", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=42)
+    argumentos = parser.parse_args()
+    executar(argumentos.pastas, argumentos.linhas, argumentos.seed)
@@ -0,0 +1,143 @@
+"""
+Micro-benchmark da normalização das planilhas.
+
+Gera CSVs sintéticos no formato das exportações (latin1, separador ';', valores
+"1.234,56", negativos, prefixo "R$", células vazias e linhas de "Total"), mede o
+filtro de linhas "total" e a conversão numérica antigos e os vetorizados de
+normalizacao.py e confere se os resultados coincidem.
+
+Uso:
+    python benchmarks/benchmark_normalizacao.py
+    python benchmarks/benchmark_normalizacao.py --tamanhos 10000 100000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalizacao import remover_linhas_total, tratar_valores_numericos
+
+COLUNAS_NUMERICAS = ["Quantidade", "Valor Faturado", "Custo", "Desconto"]
+
+
+# ---------------------- IMPLEMENTAÇÕES ANTERIORES (REFERÊNCIA) ----------------------
+def remover_linhas_total_antigo(df):
+    return df[~df.apply(lambda row: row.astype(str).str.lower().str.contains("total").any(), axis=1)]
+
+
+def tratar_valores_numericos_antigo(df, colunas):
+    for col in colunas:
+        df[col] = df[col].astype(str).str.replace('.', '', regex=False)
+        df[col] = df[col].str.replace(',', '.', regex=False)
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+# ---------------------- GERAÇÃO DOS DADOS ----------------------
+def formatar_brl(valores):
+    """
+    Formata números no padrão brasileiro: 1234.5 -> "1.234,50".
+    """
+    return [f"{v:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".") for v in valores]
+
+
+def gerar_csv(linhas, seed=42):
+    """
+    Retorna os bytes de um CSV sintético de produção com o número de linhas pedido.
+    """
+    rng = np.random.default_rng(seed)
+    unidades = np.array(["Centro", "Bairro Novo", "Shopping", "Domiciliar VIP", "Zona Sul"])
+    convenios = np.array(["Particular", "Unimed", "Bradesco", "SulAmérica", "Cassi", "Amil"])
+    exames = np.array([f"Exame {i:03d}" for i in range(300)])
+
+    valor = rng.gamma(2.0, 400.0, linhas).round(2)
+    custo = (valor * rng.uniform(0.2, 0.6, linhas)).round(2)
+    desconto = -(valor * rng.uniform(0, 0.15, linhas)).round(2)
+    valor_txt = np.array(formatar_brl(valor), dtype=object)
+    # Parte dos valores com prefixo "R$" e parte em branco
+    com_prefixo = rng.random(linhas) < 0.1
+    valor_txt[com_prefixo] = "R$ " + valor_txt[com_prefixo]
+    valor_txt[rng.random(linhas) < 0.02] = ""
+    quantidade = rng.integers(1, 20, linhas)
+
+    df = pd.DataFrame({
+        "Data": pd.Timestamp("2025-03-01") + pd.to_timedelta(rng.integers(0, 31, linhas), unit="D"),
+        "Unidade": rng.choice(unidades, linhas),
+        "Convenio": rng.choice(convenios, linhas),
+        "Exame": rng.choice(exames, linhas),
+        "Quantidade": quantidade,
+        "Valor Faturado": valor_txt,
+        "Custo": formatar_brl(custo),
+        "Desconto": formatar_brl(desconto),
+    })
+    # Linhas de subtotal espalhadas, como nas exportações do sistema
+    subtotais = rng.choice(linhas, max(1, linhas // 500), replace=False)
+    df.loc[subtotais, "Unidade"] = "TOTAL da unidade"
+    df.loc[len(df)] = ["", "Total Geral", "", "", "", formatar_brl([valor.sum()])[0], "", ""]
+    df.loc[len(df) - 1, "Quantidade"] = quantidade.sum()
+
+    buffer = io.StringIO()
+    df.to_csv(buffer, sep=";", index=False)
+    return buffer.getvalue().encode("latin1")
+
+
+def ler(conteudo):
+    return pd.read_csv(io.BytesIO(conteudo), encoding="latin1", sep=";")
+
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+# ---------------------- COMPARAÇÃO ----------------------
+def conferir(antigo, novo):
+    """
+    Confere se os resultados coincidem. A versão nova só pode diferir onde a antiga
+    devolvia NaN (ex.: "R$ 1.234,56", que antes não era convertido).
+    """
+    pd.testing.assert_index_equal(antigo.index, novo.index)
+    for col in antigo.columns:
+        if col not in COLUNAS_NUMERICAS:
+            pd.testing.assert_series_equal(antigo[col], novo[col])
+            continue
+        convertidos = antigo[col].notna()
+        np.testing.assert_allclose(novo[col][convertidos], antigo[col][convertidos])
+        assert not (novo[col].isna() & convertidos).any()
+
+
+def executar(tamanhos, rodadas):
+    print(f"{'linhas':>9} | {'etapa':<18} | {'antigo (s)':>10} | {'novo (s)':>9} | {'ganho':>7}")
+    print("-" * 66)
+    for linhas in tamanhos:
+        df = ler(gerar_csv(linhas))
+        tempos = {"filtro total": [0.0, 0.0], "conversão numérica": [0.0, 0.0]}
+        for _ in range(rodadas):
+            filtrado_antigo, t = cronometrar(remover_linhas_total_antigo, df)
+            tempos["filtro total"][0] += t
+            filtrado_novo, t = cronometrar(remover_linhas_total, df)
+            tempos["filtro total"][1] += t
+
+            numerico_antigo, t = cronometrar(tratar_valores_numericos_antigo, filtrado_antigo.copy(), COLUNAS_NUMERICAS)
+            tempos["conversão numérica"][0] += t
+            numerico_novo, t = cronometrar(tratar_valores_numericos, filtrado_novo.copy(), COLUNAS_NUMERICAS)
+            tempos["conversão numérica"][1] += t
+        conferir(numerico_antigo, numerico_novo)
+        for etapa, (antigo, novo) in tempos.items():
+            antigo, novo = antigo / rodadas, novo / rodadas
+            print(f"{linhas:>9} | {etapa:<18} | {antigo:>10.3f} | {novo:>9.3f} | {antigo / novo:>6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do filtro de totais e da conversão numérica.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--rodadas", type=int, default=1)
+    args = parser.parse_args()
+    executar(args.tamanhos, args.rodadas)
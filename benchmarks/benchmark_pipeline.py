@@ -0,0 +1,213 @@
+"""
+Benchmark de ponta a ponta do pipeline, sem rede e sem credenciais.
+
+Popula um Drive falso (servicos_falsos.DriveFalso) com as planilhas sintéticas de
+todas as pastas (dados_sinteticos), sobe o servidor local do chat completions e
+da Z-API e roda Pipeline.executar_analise em cenários sucessivos, num diretório
+temporário (os caches .cache/ começam vazios):
+
+- frio: nada em cache; baixa tudo, chama o GPT, envia ao Drive e ao WhatsApp;
+- morno: mesma análise de novo (caches de CSV, histórico e relatório memorizado);
+- novo_dia: chega a planilha do dia seguinte e a análise avança um dia;
+- forcado: mesma análise com "Forçar nova geração" (GPT de novo; o relatório
+  no Drive tem o conteúdo substituído e a planilha de indicadores já está lá);
+- fatias (com --mapa-reducao): o mesmo período com o relatório em fatias
+  paralelas e sumário executivo, comparável ao forcado.
+
+Para cada cenário mostra o tempo de ponta a ponta, o pico de memória residente
+acima do início do cenário (amostrado de /proc a cada 5 ms; n/d fora do Linux),
+as chamadas a cada serviço e o resumo por etapa do rastreamento. Com --json o
+resultado é gravado para comparar versões.
+
+Uso:
+    python benchmarks/benchmark_pipeline.py
+    python benchmarks/benchmark_pipeline.py --dias 90 --linhas-por-dia 5000 --latencia-gpt 2
+    python benchmarks/benchmark_pipeline.py --json resultado.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dados_sinteticos import PASTAS_DIARIAS, gerar_planilhas
+from servicos_falsos import DriveFalso, ServidorFalso
+
+import pipeline
+from pipeline import OPCOES_ANALISE, Pipeline
+
+SEGREDOS_FALSOS = {
+    "OPENAI_API_KEY": "sk-benchmark",
+    "ZAPI_USER": "instancia",
+    "ZAPI_TOKEN": "token",
+    "ZAPI_CLIENT_TOKEN": "cliente",
+    "ZAPI_PHONE": "5500000000000",
+    "gcp_service_account": {},
+}
+
+
+class PipelineBancada(Pipeline):
+    """
+    Pipeline com o cliente oficial do Drive montado sobre o DriveFalso no lugar
+    do transporte autenticado.
+    """
+
+    def __init__(self, segredos, drive):
+        super().__init__(segredos)
+        self.drive = drive
+
+    def obter_drive_service(self):
+        if not hasattr(self._drive_local, "service"):
+            from googleapiclient.discovery import build
+            self._drive_local.service = build("drive", "v3", http=self.drive,
+                                              static_discovery=True, cache_discovery=False)
+        return self._drive_local.service
+
+
+class MonitorMemoria:
+    """
+    Pico da memória residente (MB) acima do valor inicial enquanto o bloco roda,
+    amostrado por uma thread; fica None quando /proc/self/statm não existe.
+    """
+
+    INTERVALO = 0.005
+
+    def __init__(self):
+        self.pico_mb = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _residente():
+        with open("/proc/self/statm") as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    def _amostrar(self, inicial):
+        pico = inicial
+        while not self._parar.wait(self.INTERVALO):
+            pico = max(pico, self._residente())
+        self.pico_mb = round((max(pico, self._residente()) - inicial) / 1024 / 1024, 1)
+
+    def __enter__(self):
+        try:
+            inicial = self._residente()
+        except OSError:
+            return self
+        self._thread = threading.Thread(target=self._amostrar, args=(inicial,), daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def popular_drive(drive, planilhas):
+    for pasta, arquivos in planilhas.items():
+        for nome, conteudo in arquivos:
+            drive.adicionar(pipeline.pastas_ids[pasta], nome, conteudo)
+
+
+def medir(pipe, drive, servidor, data_inicio, data_fim, forcar, mapa_reducao=False):
+    """
+    Roda uma análise e retorna tempo, pico de memória, chamadas aos serviços e rastro.
+    """
+    chamadas_antes = drive.chamadas + servidor.chamadas
+    with MonitorMemoria() as memoria:
+        inicio = time.perf_counter()
+        analise = pipe.executar_analise(data_inicio, data_fim, [nome for _, nome in OPCOES_ANALISE],
+                                        forcar_atualizacao=forcar, mapa_reducao=mapa_reducao)
+        segundos = time.perf_counter() - inicio
+    erros = [texto for nivel, texto in analise["mensagens_carga"] + analise["mensagens_saida"] if nivel == "error"]
+    return {
+        "segundos": round(segundos, 3),
+        "pico_memoria_mb": memoria.pico_mb,
+        "chamadas": dict((drive.chamadas + servidor.chamadas) - chamadas_antes),
+        "erros": erros,
+        "etapas": analise["rastro"]["resumo"],
+    }
+
+
+def imprimir(nome, resultado):
+    chamadas = ", ".join(f"{chave}={valor}" for chave, valor in sorted(resultado["chamadas"].items())) or "nenhuma"
+    pico = "n/d" if resultado["pico_memoria_mb"] is None else f"+{resultado['pico_memoria_mb']:.1f} MB"
+    print(f"\n=== {nome}: {resultado['segundos']:.2f}s, pico de memória {pico}")
+    print(f"    chamadas: {chamadas}")
+    for erro in resultado["erros"]:
+        print(f"    ERRO: {erro}")
+    print(f"    {'etapa':<22} {'chamadas':>8} {'total (s)':>10} {'máx (s)':>8} {'MB':>8} {'linhas':>9} {'tokens':>13} {'cache':>6}")
+    for linha in resultado["etapas"]:
+        tokens = f"{linha['tokens_enviados']}/{linha['tokens_recebidos']}" if linha["tokens_enviados"] else ""
+        print(f"    {linha['etapa']:<22} {linha['chamadas']:>8} {linha['segundos']:>10.3f} {linha['segundos_max']:>8.3f} "
+              f"{linha['bytes'] / 1024 / 1024:>8.2f} {linha['linhas']:>9} {tokens:>13} {linha['acertos_cache']:>6}")
+
+
+def executar(argumentos):
+    data_fim = argumentos.data_fim
+    data_inicio = data_fim - timedelta(days=argumentos.dias_analise - 1)
+    planilhas = gerar_planilhas(data_fim, argumentos.dias, argumentos.linhas_por_dia, argumentos.seed)
+    dia_seguinte = data_fim + timedelta(days=1)
+    novas = gerar_planilhas(dia_seguinte, 1, argumentos.linhas_por_dia, argumentos.seed + 1)
+    tamanho = sum(len(conteudo) for arquivos in planilhas.values() for _, conteudo in arquivos)
+    print(f"Drive falso: {sum(map(len, planilhas.values()))} planilhas, {tamanho / 1024 / 1024:.1f} MB; "
+          f"análise de {data_inicio} a {data_fim}")
+
+    drive = DriveFalso(latencia=argumentos.latencia_drive, banda_mb_s=argumentos.banda_drive)
+    popular_drive(drive, planilhas)
+    servidor = ServidorFalso(argumentos.latencia_gpt, argumentos.intervalo_trecho,
+                             argumentos.trechos_resposta, argumentos.latencia_zapi, argumentos.limite_gpt)
+    resultados = {}
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as diretorio, servidor:
+        # Os caches do Pipeline (.cache/...) ficam no diretório temporário
+        os.chdir(diretorio)
+        try:
+            pipe = PipelineBancada({**SEGREDOS_FALSOS, **servidor.segredos()}, drive)
+            resultados["frio"] = medir(pipe, drive, servidor, data_inicio, data_fim, False)
+            resultados["morno"] = medir(pipe, drive, servidor, data_inicio, data_fim, False)
+            popular_drive(drive, {pasta: novas[pasta] for pasta in PASTAS_DIARIAS})
+            resultados["novo_dia"] = medir(pipe, drive, servidor, data_inicio + timedelta(days=1), dia_seguinte, False)
+            resultados["forcado"] = medir(pipe, drive, servidor, data_inicio + timedelta(days=1), dia_seguinte, True)
+            if argumentos.mapa_reducao:
+                # Mesmo período gerado em fatias paralelas, para comparar com o forcado
+                resultados["fatias"] = medir(pipe, drive, servidor, data_inicio + timedelta(days=1), dia_seguinte, False, True)
+        finally:
+            os.chdir(diretorio_original)
+
+    for nome, resultado in resultados.items():
+        imprimir(nome, resultado)
+    # ru_maxrss: KB no Linux, bytes no macOS
+    pico_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    print(f"\nPico de memória residente do processo: {pico_rss:.0f} MB")
+
+    if argumentos.json:
+        with open(argumentos.json, "w", encoding="utf-8") as arquivo:
+            json.dump({"parametros": {chave: str(valor) for chave, valor in vars(argumentos).items()},
+                       "pico_rss_mb": round(pico_rss), "cenarios": resultados}, arquivo, ensure_ascii=False, indent=2)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta com Drive, OpenAI e Z-API locais.")
+    parser.add_argument("--data-fim", type=date.fromisoformat, default=date(2025, 3, 31))
+    parser.add_argument("--dias", type=int, default=31, help="dias de planilhas diárias no Drive")
+    parser.add_argument("--dias-analise", type=int, default=31, help="tamanho do período analisado")
+    parser.add_argument("--linhas-por-dia", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latencia-drive", type=float, default=0.05, help="segundos por requisição ao Drive")
+    parser.add_argument("--banda-drive", type=float, default=20.0, help="MB/s dos downloads e uploads")
+    parser.add_argument("--latencia-gpt", type=float, default=1.0, help="segundos até o primeiro trecho")
+    parser.add_argument("--intervalo-trecho", type=float, default=0.005, help="segundos entre os trechos")
+    parser.add_argument("--trechos-resposta", type=int, default=400)
+    parser.add_argument("--latencia-zapi", type=float, default=0.2)
+    parser.add_argument("--limite-gpt", type=int, help="chamadas simultâneas aceitas pelo GPT falso (além delas, 429)")
+    parser.add_argument("--mapa-reducao", action="store_true", help="acrescenta o cenário do relatório em fatias")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    executar(parser.parse_args())
@@ -0,0 +1,253 @@
+"""
+Gerador das planilhas sintéticas de todas as pastas do Drive (pastas_ids).
+
+Cada pasta recebe CSVs no formato das exportações do sistema (latin1, separador
+';', valores "1.234,56", prefixo "R$", células vazias e linhas de "Total"), com as
+colunas que o app procura por palavra-chave. As pastas com um arquivo por dia
+(produção geral, produção por convênio e custo geral) recebem um arquivo para
+cada dia do intervalo; as demais, um único arquivo. As pastas de saída
+(saida_gpt e planilha_mestre_saida) começam vazias.
+
+Uso isolado, gravando os arquivos em disco:
+    python benchmarks/dados_sinteticos.py destino/ --dias 31 --linhas-por-dia 2000
+"""
+import argparse
+import io
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_normalizacao import formatar_brl
+
+UNIDADES = ["Centro", "Bairro Novo", "Shopping", "Domiciliar VIP", "Zona Sul"]
+CONVENIOS = ["Particular", "Unimed", "Bradesco", "SulAmérica", "Cassi", "Amil"]
+EXAMES = [f"Exame {i:03d}" for i in range(300)]
+PASTAS_DE_SAIDA = ("saida_gpt", "planilha_mestre_saida")
+
+
+def _valores(rng, linhas, media=400.0):
+    return rng.gamma(2.0, media / 2, linhas).round(2)
+
+
+def _brl(rng, valores, prefixo=0.1, vazios=0.02):
+    """
+    Valores no padrão brasileiro, parte com "R$" e parte em branco.
+    """
+    texto = np.array(formatar_brl(valores), dtype=object)
+    com_prefixo = rng.random(len(texto)) < prefixo
+    texto[com_prefixo] = "R$ " + texto[com_prefixo]
+    texto[rng.random(len(texto)) < vazios] = ""
+    return texto
+
+
+# ---------------------- LAYOUT DE CADA PASTA ----------------------
+def _producao_geral(rng, linhas, dia):
+    valor = _valores(rng, linhas)
+    return pd.DataFrame({
+        "Data": dia.strftime("%d/%m/%Y"),
+        "Unidade": rng.choice(UNIDADES, linhas),
+        "Convênio": rng.choice(CONVENIOS, linhas),
+        "Empresa": rng.choice(["LJP", "LMG"], linhas, p=[0.8, 0.2]),
+        "Paciente": rng.integers(1, max(linhas // 3, 2), linhas),
+        "Exame": rng.choice(EXAMES, linhas),
+        "Quantidade": rng.integers(1, 5, linhas),
+        "Valor Faturado": _brl(rng, valor),
+        "Custo": formatar_brl((valor * rng.uniform(0.2, 0.6, linhas)).round(2)),
+        "Desconto": formatar_brl(-(valor * rng.uniform(0, 0.15, linhas)).round(2)),
+    })
+
+
+def _producao_por_convenio(rng, linhas, dia):
+    return pd.DataFrame({
+        "Data": dia.strftime("%d/%m/%Y"),
+        "Convênio": rng.choice(CONVENIOS, linhas),
+        "Paciente": rng.integers(1, max(linhas // 2, 2), linhas),
+        "Quantidade Exames": rng.integers(1, 8, linhas),
+        "Valor Faturado": _brl(rng, _valores(rng, linhas, 600.0)),
+    })
+
+
+def _custo_geral(rng, linhas, dia):
+    return pd.DataFrame({
+        "Data": dia.strftime("%d/%m/%Y"),
+        "Categoria": rng.choice(["Pessoal", "Aluguel", "Reagentes", "Energia", "Marketing"], linhas),
+        "Descrição": [f"Lançamento {i}" for i in range(linhas)],
+        "Valor": _brl(rng, _valores(rng, linhas, 1500.0), vazios=0),
+    })
+
+
+def _orcamentos(rng, linhas, dia):
+    valor = _valores(rng, linhas, 300.0)
+    return pd.DataFrame({
+        "Data": [(dia - timedelta(days=int(d))).strftime("%d/%m/%Y") for d in rng.integers(0, 30, linhas)],
+        "Unidade": rng.choice(UNIDADES, linhas),
+        "Paciente": rng.integers(1, 100_000, linhas),
+        "Valor Orçado": _brl(rng, valor),
+        "Desconto": formatar_brl((valor * rng.uniform(0, 0.2, linhas)).round(2)),
+    })
+
+
+def _fidelidade(rng, linhas, dia):
+    return pd.DataFrame({
+        "Paciente": np.arange(1, linhas + 1),
+        "Frequencia": rng.integers(1, 12, linhas),
+        "Qtd Exames": rng.integers(1, 40, linhas),
+        "Última Visita": dia.strftime("%d/%m/%Y"),
+    })
+
+
+def _extratos(rng, linhas, dia):
+    movimento = rng.normal(0, 5000, linhas).round(2)
+    return pd.DataFrame({
+        "Data": [(dia - timedelta(days=int(d))).strftime("%d/%m/%Y") for d in rng.integers(0, 30, linhas)],
+        "Histórico": rng.choice(["PIX RECEBIDO", "TED", "BOLETO", "TARIFA", "CARTAO"], linhas),
+        "Valor Mov": formatar_brl(movimento),
+        "Saldo": formatar_brl((movimento.cumsum() + 100_000).round(2)),
+    })
+
+
+def _exames_por(coluna, opcoes):
+    def gerar(rng, linhas, dia):
+        return pd.DataFrame({
+            coluna: rng.choice(opcoes, linhas),
+            "Exame": rng.choice(EXAMES, linhas),
+            "Quantidade": rng.integers(1, 200, linhas),
+            "Valor Faturado": _brl(rng, _valores(rng, linhas, 5000.0)),
+        })
+    return gerar
+
+
+def _prazo_medio(rng, linhas, dia):
+    return pd.DataFrame({
+        "Convênio": CONVENIOS,
+        "PMR (dias)": [0, 45, 60, 38, 90, 52],
+        "Valor Faturado": _brl(rng, _valores(rng, len(CONVENIOS), 80_000.0), prefixo=0, vazios=0),
+    })
+
+
+def _marketing(rng, linhas, dia):
+    quantidade = min(linhas, 50)
+    return pd.DataFrame({
+        "Campanha": [f"Campanha {i}" for i in range(quantidade)],
+        "Canal": rng.choice(["Instagram", "Google", "Rádio", "Panfleto"], quantidade),
+        "Valor Investido": formatar_brl(_valores(rng, quantidade, 2000.0)),
+        "ROI": formatar_brl(rng.uniform(0.5, 4, quantidade).round(2)),
+    })
+
+
+def _tributos(aliquotas):
+    def gerar(rng, linhas, dia):
+        return pd.DataFrame({
+            "Tributo": list(aliquotas),
+            "Base de Cálculo (%)": formatar_brl([100.0] * len(aliquotas)),
+            "Alíquota (%)": formatar_brl(list(aliquotas.values())),
+        })
+    return gerar
+
+
+def _meta_mes(rng, linhas, dia):
+    return pd.DataFrame({
+        "Mês": [dia.strftime("%m/%Y")],
+        "Meta": formatar_brl([2_500_000.0]),
+    })
+
+
+def _tabela_precos(rng, linhas, dia):
+    return pd.DataFrame({
+        "Convênio": np.repeat(CONVENIOS, len(EXAMES)),
+        "Exame": EXAMES * len(CONVENIOS),
+        "Valor": formatar_brl(_valores(rng, len(EXAMES) * len(CONVENIOS), 80.0)),
+    })
+
+
+def _tabela_custos(rng, linhas, dia):
+    return pd.DataFrame({
+        "Exame": EXAMES,
+        "Custo": formatar_brl(_valores(rng, len(EXAMES), 25.0)),
+    })
+
+
+# Pasta -> (gerador, um arquivo por dia, fração de linhas_por_dia em cada arquivo)
+LAYOUTS = {
+    "producao_diaria_geral": (_producao_geral, True, 1.0),
+    "producao_diaria_por_convenio": (_producao_por_convenio, True, 0.5),
+    "custo_geral": (_custo_geral, True, 0.02),
+    "orcamentos_nao_convertidos": (_orcamentos, False, 2.0),
+    "fidelidade": (_fidelidade, False, 5.0),
+    "extratos_bancarios": (_extratos, False, 0.5),
+    "exames_por_convenio": (_exames_por("Convênio", CONVENIOS), False, 0.5),
+    "exames_por_unidade": (_exames_por("Unidade", UNIDADES), False, 0.5),
+    "prazo_medio": (_prazo_medio, False, 0),
+    "estrategia_marketing": (_marketing, False, 0.01),
+    "tributos_ljp": (_tributos({"PIS": 0.65, "COFINS": 3.0, "IRPJ": 4.8, "CSLL": 2.88, "ISS": 5.0}), False, 0),
+    "tributos_lmg": (_tributos({"Simples Nacional": 11.2}), False, 0),
+    "meta_mes": (_meta_mes, False, 0),
+    "tabela_preco_convenios": (_tabela_precos, False, 0),
+    "tabela_custos_exames": (_tabela_custos, False, 0),
+}
+PASTAS_DIARIAS = tuple(pasta for pasta, (_, por_dia, _) in LAYOUTS.items() if por_dia)
+
+
+def para_csv(df, rng):
+    """
+    Bytes do CSV como nas exportações: subtotais espalhados e um "Total Geral" no fim,
+    com menos campos que o cabeçalho (ex.: "Total Geral;;1.234,56").
+    """
+    df = df.copy()
+    texto = [coluna for coluna in df.columns if not pd.api.types.is_numeric_dtype(df[coluna])]
+    if len(df) > 20 and texto:
+        subtotais = rng.choice(len(df), max(1, len(df) // 500), replace=False)
+        df.loc[df.index[subtotais], texto[-1]] = "TOTAL parcial"
+    buffer = io.StringIO()
+    df.to_csv(buffer, sep=";", index=False)
+    campos = max(1, min(3, len(df.columns) - 1))
+    total = ["Total Geral"] + [""] * (campos - 2) + ["1.234,56"] * (campos > 1)
+    buffer.write(";".join(total) + "\n")
+    return buffer.getvalue().encode("latin1")
+
+
+def gerar_planilhas(data_fim, dias=31, linhas_por_dia=2000, seed=42):
+    """
+    Planilhas de todas as pastas: {pasta: [(nome do arquivo, bytes), ...]}, em ordem
+    de exportação (os arquivos diários do dia mais antigo para o mais recente).
+    """
+    rng = np.random.default_rng(seed)
+    planilhas = {}
+    for pasta, (gerar, por_dia, fracao) in LAYOUTS.items():
+        linhas = max(int(linhas_por_dia * fracao), 1)
+        if por_dia:
+            datas = [data_fim - timedelta(days=d) for d in range(dias - 1, -1, -1)]
+            planilhas[pasta] = [(f"{pasta}_{dia:%d-%m-%Y}.csv", para_csv(gerar(rng, linhas, dia), rng)) for dia in datas]
+        else:
+            planilhas[pasta] = [(f"{pasta}.csv", para_csv(gerar(rng, linhas, data_fim), rng))]
+    for pasta in PASTAS_DE_SAIDA:
+        planilhas[pasta] = []
+    return planilhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera as planilhas sintéticas de todas as pastas do Drive.")
+    parser.add_argument("destino")
+    parser.add_argument("--data-fim", type=date.fromisoformat, default=date.today() - timedelta(days=1))
+    parser.add_argument("--dias", type=int, default=31)
+    parser.add_argument("--linhas-por-dia", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    argumentos = parser.parse_args(argv)
+
+    planilhas = gerar_planilhas(argumentos.data_fim, argumentos.dias, argumentos.linhas_por_dia, argumentos.seed)
+    for pasta, arquivos in planilhas.items():
+        os.makedirs(os.path.join(argumentos.destino, pasta), exist_ok=True)
+        for nome, conteudo in arquivos:
+            with open(os.path.join(argumentos.destino, pasta, nome), "wb") as arquivo:
+                arquivo.write(conteudo)
+        tamanho = sum(len(conteudo) for _, conteudo in arquivos)
+        print(f"{pasta:<30} {len(arquivos):>4} arquivo(s) {tamanho / 1024 / 1024:>8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Substitutos locais do Google Drive, da OpenAI e da Z-API para os benchmarks.
+
+- DriveFalso: transporte no lugar do httplib2, entregue ao cliente oficial do
+  googleapiclient (build(..., http=DriveFalso)). Atende files.list (com as
+  consultas usadas pelo app, paginação e orderBy), files.get_media (com Range),
+  files.create e files.update (upload multipart com appProperties) e o feed de mudanças
+  (changes.getStartPageToken e changes.list), guardando tudo em memória.
+- ServidorFalso: servidor HTTP local com o chat completions em stream (eventos
+  SSE com codificação chunked, como a OpenAI) e o send-text da Z-API. O Pipeline
+  usa os endereços dele pelos segredos OPENAI_BASE_URL e ZAPI_BASE_URL.
+
+As latências são configuráveis e cada chamada é contada, para o benchmark
+mostrar quantas idas à rede cada cenário faz.
+"""
+import email
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import httplib2
+
+_PAI = re.compile(r"'([^']+)' in parents")
+_MIMETYPE = re.compile(r"mimeType\s*=\s*'([^']+)'")
+_MODIFICADO_APOS = re.compile(r"modifiedTime\s*>\s*'([^']+)'")
+_PROPRIEDADE = re.compile(r"appProperties has \{\s*key='([^']+)' and value='([^']*)'\s*\}")
+
+
+# ---------------------- GOOGLE DRIVE ----------------------
+class DriveFalso:
+    """
+    Pastas e arquivos do Drive em memória, seguro para threads.
+    `latencia` é o tempo (s) de cada requisição e `banda_mb_s` limita a transferência
+    dos conteúdos (downloads e uploads); None não limita.
+    """
+
+    def __init__(self, latencia=0.05, banda_mb_s=None, tamanho_pagina=1000):
+        self.latencia = latencia
+        self.banda_mb_s = banda_mb_s
+        self.tamanho_pagina = tamanho_pagina
+        self.chamadas = Counter()
+        self._arquivos = {}
+        self._conteudos = {}
+        # Feed de mudanças: um file_id por criação, na ordem; o token é a posição
+        self._mudancas = []
+        self._lock = threading.Lock()
+        self._proximo_id = 0
+        self._relogio = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def adicionar(self, pasta_id, nome, conteudo, mimetype="text/csv", app_properties=None):
+        """
+        Cria o arquivo na pasta e retorna os metadados. Cada arquivo novo recebe um
+        modifiedTime posterior ao do anterior, como numa pasta alimentada aos poucos.
+        """
+        with self._lock:
+            self._proximo_id += 1
+            self._relogio += timedelta(seconds=1)
+            arquivo = {
+                "id": f"arq{self._proximo_id:06d}",
+                "name": nome,
+                "mimeType": mimetype,
+                "parents": [pasta_id],
+                "modifiedTime": self._relogio.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "md5Checksum": hashlib.md5(conteudo).hexdigest(),
+                "appProperties": dict(app_properties or {}),
+            }
+            self._arquivos[arquivo["id"]] = arquivo
+            self._conteudos[arquivo["id"]] = conteudo
+            self._mudancas.append(arquivo["id"])
+        return arquivo
+
+    def _esperar(self, tamanho=0):
+        espera = self.latencia
+        if self.banda_mb_s:
+            espera += tamanho / (self.banda_mb_s * 1024 * 1024)
+        if espera > 0:
+            time.sleep(espera)
+
+    # Interface do httplib2.Http usada pelo googleapiclient
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        partes = urlsplit(uri)
+        parametros = {chave: valores[0] for chave, valores in parse_qs(partes.query).items()}
+        headers = {chave.lower(): valor for chave, valor in (headers or {}).items()}
+        if method == "GET" and partes.path == "/drive/v3/files":
+            return self._listar(parametros)
+        if method == "GET" and partes.path == "/drive/v3/changes/startPageToken":
+            return self._token_inicial()
+        if method == "GET" and partes.path == "/drive/v3/changes":
+            return self._listar_mudancas(parametros)
+        if method == "GET" and partes.path.startswith("/drive/v3/files/") and parametros.get("alt") == "media":
+            return self._baixar(partes.path.rsplit("/", 1)[1], headers.get("range"))
+        if method == "POST" and partes.path == "/upload/drive/v3/files":
+            return self._criar(body, headers.get("content-type", ""))
+        if method == "PATCH" and partes.path.startswith("/upload/drive/v3/files/"):
+            return self._atualizar(partes.path.rsplit("/", 1)[1], body, headers.get("content-type", ""))
+        return self._resposta(404, {"error": {"code": 404, "message": f"{method} {partes.path} não suportado"}})
+
+    def _resposta(self, status, conteudo, cabecalhos=None):
+        if not isinstance(conteudo, bytes):
+            conteudo = json.dumps(conteudo).encode("utf-8")
+        return httplib2.Response({"status": str(status), **(cabecalhos or {})}), conteudo
+
+    def _contar(self, chamada):
+        with self._lock:
+            self.chamadas[chamada] += 1
+
+    def _listar(self, parametros):
+        self._contar("list")
+        consulta = parametros.get("q", "")
+        with self._lock:
+            arquivos = list(self._arquivos.values())
+        pai = _PAI.search(consulta)
+        if pai:
+            arquivos = [arq for arq in arquivos if pai.group(1) in arq["parents"]]
+        mimetype = _MIMETYPE.search(consulta)
+        if mimetype:
+            arquivos = [arq for arq in arquivos if arq["mimeType"] == mimetype.group(1)]
+        modificado_apos = _MODIFICADO_APOS.search(consulta)
+        if modificado_apos:
+            arquivos = [arq for arq in arquivos if arq["modifiedTime"] > modificado_apos.group(1)]
+        for chave, valor in _PROPRIEDADE.findall(consulta):
+            arquivos = [arq for arq in arquivos if arq["appProperties"].get(chave) == valor]
+        if parametros.get("orderBy") == "modifiedTime desc":
+            arquivos.sort(key=lambda arq: arq["modifiedTime"], reverse=True)
+        else:
+            arquivos.sort(key=lambda arq: arq["id"])
+
+        tamanho = min(int(parametros.get("pageSize", 100)), self.tamanho_pagina)
+        inicio = int(parametros.get("pageToken") or 0)
+        pagina = arquivos[inicio:inicio + tamanho]
+        resultado = {"files": [{c: arq[c] for c in ("id", "name", "modifiedTime", "md5Checksum")} for arq in pagina]}
+        if inicio + tamanho < len(arquivos):
+            resultado["nextPageToken"] = str(inicio + tamanho)
+        self._esperar()
+        return self._resposta(200, resultado)
+
+    def _token_inicial(self):
+        self._contar("changes_token")
+        with self._lock:
+            token = str(len(self._mudancas))
+        self._esperar()
+        return self._resposta(200, {"startPageToken": token})
+
+    def _listar_mudancas(self, parametros):
+        self._contar("changes")
+        inicio = int(parametros["pageToken"])
+        tamanho = min(int(parametros.get("pageSize", 100)), self.tamanho_pagina)
+        with self._lock:
+            ids = self._mudancas[inicio:inicio + tamanho]
+            fim = len(self._mudancas)
+            mudancas = [{"fileId": file_id, "removed": False,
+                         "file": {**{c: self._arquivos[file_id][c] for c in ("id", "name", "mimeType", "parents",
+                                                                            "modifiedTime", "md5Checksum")},
+                                  "trashed": False}}
+                        for file_id in ids]
+        resultado = {"changes": mudancas}
+        if inicio + tamanho < fim:
+            resultado["nextPageToken"] = str(inicio + tamanho)
+        else:
+            resultado["newStartPageToken"] = str(fim)
+        self._esperar()
+        return self._resposta(200, resultado)
+
+    def _baixar(self, file_id, intervalo):
+        self._contar("get_media")
+        with self._lock:
+            conteudo = self._conteudos.get(file_id)
+        if conteudo is None:
+            self._esperar()
+            return self._resposta(404, {"error": {"code": 404, "message": f"File not found: {file_id}"}})
+        if intervalo is None:
+            self._esperar(len(conteudo))
+            return self._resposta(200, conteudo, {"content-length": str(len(conteudo))})
+        inicio, fim = (int(n) for n in intervalo.split("=", 1)[1].split("-"))
+        trecho = conteudo[inicio:fim + 1]
+        self._esperar(len(trecho))
+        cabecalhos = {"content-range": f"bytes {inicio}-{inicio + len(trecho) - 1}/{len(conteudo)}"}
+        return self._resposta(206, trecho, cabecalhos)
+
+    @staticmethod
+    def _ler_multipart(corpo, tipo_conteudo):
+        """
+        Upload multipart/related: metadados em JSON seguidos do conteúdo.
+        Retorna (metadados, conteúdo, mimetype do conteúdo).
+        """
+        if isinstance(corpo, str):
+            corpo = corpo.encode("utf-8")
+        mensagem = email.message_from_bytes(f"Content-Type: {tipo_conteudo}\r\n\r\n".encode("utf-8") + corpo)
+        metadados_parte, conteudo_parte = mensagem.get_payload()
+        return (json.loads(metadados_parte.get_payload(decode=True)),
+                conteudo_parte.get_payload(decode=True), conteudo_parte.get_content_type())
+
+    def _atualizar(self, file_id, corpo, tipo_conteudo):
+        self._contar("update")
+        metadados, conteudo, _ = self._ler_multipart(corpo, tipo_conteudo)
+        self._esperar(len(conteudo))
+        with self._lock:
+            arquivo = self._arquivos.get(file_id)
+            if arquivo is None:
+                return self._resposta(404, {"error": {"code": 404, "message": f"File not found: {file_id}"}})
+            self._relogio += timedelta(seconds=1)
+            arquivo["appProperties"].update(metadados.get("appProperties", {}))
+            arquivo["modifiedTime"] = self._relogio.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            arquivo["md5Checksum"] = hashlib.md5(conteudo).hexdigest()
+            self._conteudos[file_id] = conteudo
+            self._mudancas.append(file_id)
+        return self._resposta(200, {"id": file_id})
+
+    def _criar(self, corpo, tipo_conteudo):
+        self._contar("create")
+        metadados, conteudo, mimetype = self._ler_multipart(corpo, tipo_conteudo)
+        self._esperar(len(conteudo))
+        arquivo = self.adicionar(metadados["parents"][0], metadados["name"], conteudo,
+                                 mimetype, metadados.get("appProperties"))
+        return self._resposta(200, {"id": arquivo["id"]})
+
+
+# ---------------------- OPENAI E Z-API ----------------------
+class ServidorFalso:
+    """
+    Servidor HTTP local em uma thread de fundo, usado como `with ServidorFalso(...) as servidor`.
+    O chat completions espera `latencia_gpt` segundos antes do primeiro trecho e
+    `intervalo_trecho` entre os `trechos_resposta` trechos seguintes (cada trecho
+    conta como ~2 tokens para o max_tokens do pedido); o send-text responde depois
+    de `latencia_zapi` segundos. Com `limite_gpt`, as chamadas ao chat completions
+    além desse número em andamento recebem 429 com Retry-After de 1 segundo, como
+    uma conta com limite baixo.
+    """
+
+    def __init__(self, latencia_gpt=1.0, intervalo_trecho=0.01, trechos_resposta=400, latencia_zapi=0.2,
+                 limite_gpt=None):
+        self.latencia_gpt = latencia_gpt
+        self.intervalo_trecho = intervalo_trecho
+        self.trechos_resposta = trechos_resposta
+        self.latencia_zapi = latencia_zapi
+        self.limite_gpt = limite_gpt
+        self.chamadas = Counter()
+        self._gpt_em_andamento = 0
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), self._criar_manipulador())
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def segredos(self):
+        """
+        Segredos do Pipeline apontando para este servidor.
+        """
+        return {"OPENAI_BASE_URL": f"{self.url}/v1", "ZAPI_BASE_URL": self.url}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def _criar_manipulador(self):
+        servidor = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _ler_json(self):
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(tamanho) or b"{}")
+
+            def _responder_json(self, status, dados):
+                corpo = json.dumps(dados).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def _enviar_trecho(self, dados):
+                self.wfile.write(f"{len(dados):X}\r\n".encode("ascii") + dados + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                if self.path.endswith("/chat/completions"):
+                    self._chat(self._ler_json())
+                elif self.path.endswith("/send-text"):
+                    self._zapi(self._ler_json())
+                else:
+                    self._responder_json(404, {"error": f"POST {self.path} não suportado"})
+
+            def _chat(self, payload):
+                with servidor._lock:
+                    if servidor.limite_gpt and servidor._gpt_em_andamento >= servidor.limite_gpt:
+                        servidor.chamadas["chat_completions_429"] += 1
+                        recusar = True
+                    else:
+                        servidor.chamadas["chat_completions"] += 1
+                        servidor._gpt_em_andamento += 1
+                        recusar = False
+                if recusar:
+                    corpo = b'{"error": {"message": "Rate limit reached"}}'
+                    self.send_response(429)
+                    self.send_header("Retry-After", "1")
+                    self.send_header("Content-Length", str(len(corpo)))
+                    self.end_headers()
+                    self.wfile.write(corpo)
+                    return
+                try:
+                    self._transmitir_chat(payload)
+                finally:
+                    with servidor._lock:
+                        servidor._gpt_em_andamento -= 1
+
+            def _transmitir_chat(self, payload):
+                time.sleep(servidor.latencia_gpt)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                trechos = servidor.trechos_resposta
+                if payload.get("max_tokens"):
+                    trechos = min(trechos, payload["max_tokens"] // 2)
+                for i in range(trechos):
+                    if i:
+                        time.sleep(servidor.intervalo_trecho)
+                    texto = "\n\n## Seção\n" if i % 50 == 0 else f"indicador{i % 7} "
+                    evento = {"choices": [{"index": 0, "delta": {"content": texto}}]}
+                    self._enviar_trecho(f"data: {json.dumps(evento)}\n\n".encode("utf-8"))
+                self._enviar_trecho(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _zapi(self, payload):
+                with servidor._lock:
+                    servidor.chamadas["send_text"] += 1
+                    numero = servidor.chamadas["send_text"]
+                time.sleep(servidor.latencia_zapi)
+                self._responder_json(200, {"zaapId": f"z{numero}", "messageId": f"m{numero}", "id": f"m{numero}"})
+
+        return Manipulador
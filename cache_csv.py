@@ -0,0 +1,79 @@
+import os
+import hashlib
+import threading
+
+import pandas as pd
+
+# ---------------------- CACHE LOCAL DOS CSVs DO DRIVE ----------------------
+# Os DataFrames já lidos e normalizados são gravados em Parquet, um arquivo por
+# versão do arquivo do Drive. A versão combina modifiedTime, md5Checksum e as
+# regras de normalização, então qualquer alteração no Drive gera uma nova entrada.
+# O tamanho total é limitado e os arquivos menos usados recentemente são removidos.
+
+class CacheCSV:
+    """
+    Cache em disco de DataFrames indexado pelo id do arquivo no Drive e pela sua versão.
+    Seguro para uso a partir das threads do carregamento paralelo.
+    """
+
+    def __init__(self, pasta, limite_bytes):
+        self.pasta = pasta
+        self.limite_bytes = limite_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def _caminho(self, file_id, versao):
+        resumo = hashlib.sha1(versao.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.pasta, f"{file_id}_{resumo}.parquet")
+
+    def obter(self, file_id, versao):
+        """
+        Retorna o DataFrame em cache ou None se a versão não estiver armazenada.
+        Um acerto atualiza a data de acesso do arquivo, usada na remoção LRU.
+        """
+        caminho = self._caminho(file_id, versao)
+        try:
+            df = pd.read_parquet(caminho)
+            os.utime(caminho)
+        except (OSError, ValueError):
+            return None
+        return df
+
+    def gravar(self, file_id, versao, df):
+        """
+        Grava o DataFrame, descarta versões antigas do mesmo arquivo e aplica o limite de tamanho.
+        Falhas de gravação não interrompem a análise: o cache é apenas uma otimização.
+        """
+        caminho = self._caminho(file_id, versao)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        try:
+            df.to_parquet(temporario)
+            os.replace(temporario, caminho)
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            return
+        with self._lock:
+            for nome in os.listdir(self.pasta):
+                antigo = os.path.join(self.pasta, nome)
+                if nome.startswith(f"{file_id}_") and nome.endswith(".parquet") and antigo != caminho:
+                    os.remove(antigo)
+            self._remover_excedente()
+
+    def _remover_excedente(self):
+        """
+        Remove os arquivos com acesso mais antigo até o cache caber no limite.
+        """
+        arquivos = []
+        for nome in os.listdir(self.pasta):
+            if not nome.endswith(".parquet"):
+                continue
+            caminho = os.path.join(self.pasta, nome)
+            info = os.stat(caminho)
+            arquivos.append((info.st_mtime, info.st_size, caminho))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.limite_bytes:
+                break
+            os.remove(caminho)
+            total -= tamanho
@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+# ---------------------- CACHE DE RELATÓRIOS GERADOS ----------------------
+# Um relatório é identificado pela impressão digital dos dados de entrada
+# (id e checksum de cada arquivo do Drive), do período, das análises marcadas
+# e do modelo. A mesma combinação devolve o relatório gravado, sem nova chamada
+# ao GPT nem novo upload para o Drive.
+
+def impressao_digital(arquivos, periodo, opcoes_analise, modelo, modo=None, unidades_lmg=()):
+    """
+    Hash SHA-256 das entradas do relatório.
+    `arquivos` mapeia cada planilha para a lista de metadados do Drive (id,
+    md5Checksum, modifiedTime) dos arquivos lidos, vazia quando nada foi encontrado.
+    `modo` distingue relatórios gerados de outra forma (ex.: "fatias"); sem ele a
+    impressão é a mesma das versões anteriores. `unidades_lmg` (segredo UNIDADES_LMG)
+    muda os tributos calculados e entra na impressão só quando configurado.
+    """
+    entradas = {
+        "arquivos": {
+            chave: sorted([arq.get("id") or "", arq.get("md5Checksum") or "", arq.get("modifiedTime") or ""] for arq in lista)
+            for chave, lista in sorted(arquivos.items())
+        },
+        "periodo": [periodo["inicio"], periodo["fim"]],
+        "opcoes_analise": sorted(opcoes_analise),
+        "modelo": modelo,
+    }
+    if modo is not None:
+        entradas["modo"] = modo
+    if unidades_lmg:
+        entradas["unidades_lmg"] = sorted(unidades_lmg)
+    texto = json.dumps(entradas, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class CacheRelatorios:
+    """
+    Relatórios gravados em disco, um JSON por impressão digital, com o texto e os
+    ids dos arquivos já enviados ao Drive.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self._lock = threading.Lock()
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, f"{chave}.json")
+
+    def obter(self, chave):
+        """
+        Retorna o registro gravado ({"relatorio", "criado_em", ...}) ou None.
+        """
+        try:
+            with open(self._caminho(chave), encoding="utf-8") as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return None
+
+    def gravar(self, chave, **campos):
+        """
+        Cria ou atualiza o registro da chave com os campos informados.
+        """
+        with self._lock:
+            registro = self.obter(chave) or {"criado_em": datetime.now().isoformat(timespec="seconds")}
+            registro.update(campos)
+            temporario = f"{self._caminho(chave)}.tmp"
+            with open(temporario, "w", encoding="utf-8") as arquivo:
+                json.dump(registro, arquivo, ensure_ascii=False)
+            os.replace(temporario, self._caminho(chave))
+        return registro
+
+    def chaves(self):
+        """
+        Chaves de todos os registros gravados, em ordem arbitrária.
+        """
+        return [nome[:-len(".json")] for nome in os.listdir(self.pasta) if nome.endswith(".json")]
+
+    def remover(self, chave):
+        with self._lock:
+            try:
+                os.remove(self._caminho(chave))
+            except FileNotFoundError:
+                pass
+
+    def listar(self):
+        """
+        Todos os registros gravados, em ordem arbitrária.
+        """
+        registros = []
+        for chave in self.chaves():
+            registro = self.obter(chave)
+            if registro is not None:
+                registros.append(registro)
+        return registros
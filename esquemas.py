@@ -0,0 +1,421 @@
+import csv
+import io
+import json
+import re
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from pandas.api.types import union_categoricals
+
+from normalizacao import sem_acento
+from rastreamento import etapa
+
+# ---------------------- ESQUEMAS DAS PLANILHAS ----------------------
+# Cada pasta do Drive tem um esquema com as palavras-chave (sem acento) que
+# identificam o papel de cada coluna, já que os nomes exatos variam entre as
+# exportações. A leitura é feita em lotes direto do fluxo do download (leitor de
+# CSV em fluxo do pyarrow), com todas as células como texto; cada lote é filtrado
+# e tipado com o pyarrow.compute e só o resultado final vira DataFrame, já sem as
+# linhas de "total" e com os tipos do esquema: números no formato brasileiro,
+# datas, colunas categóricas (unidade, convênio, exame...) e texto livre. Colunas
+# fora do esquema só viram número quando todos os valores são números simples.
+#
+# O que não bate com o esquema é relatado em df.attrs["divergencias"] em vez de
+# virar NaN em silêncio: colunas obrigatórias ausentes, colunas novas e valores
+# que não formam número ou data. Quando palavras de papéis diferentes casam com a
+# mesma coluna, vale a mais específica (a que contém a outra: "centro de custo"
+# ganha de "custo"); entre as demais, a do primeiro papel nesta ordem, para que
+# "Qtd Pacientes" e "Valor Pago Paciente" continuem números:
+PAPEIS = ("numericas", "datas", "texto", "categoricas")
+
+# Formato das exportações do sistema; cada esquema pode substituir uma parte em "formato"
+FORMATO_PADRAO = {"encoding": "latin1", "sep": ";", "decimal": ",", "milhar": ".", "data": "%d/%m/%Y"}
+# Bytes do CSV convertidos em cada lote da leitura
+BYTES_POR_LOTE = 2 * 1024 * 1024
+
+ESQUEMAS = {
+    "producao_diaria_geral": {
+        "texto": ("paciente", "nome", "cod"),
+        "datas": ("data",),
+        "numericas": ("fatur", "valor", "custo", "desconto", "quant", "qtd"),
+        "categoricas": ("unidade", "conv", "empresa", "exame", "procedimento"),
+        "obrigatorias": (("unidade",), ("conv",), ("fatur", "valor")),
+    },
+    "producao_diaria_por_convenio": {
+        "texto": ("paciente", "nome"),
+        "datas": ("data",),
+        "numericas": ("quant", "qtd", "valor", "fatur"),
+        "categoricas": ("conv", "unidade", "exame"),
+        "obrigatorias": (("conv",), ("fatur", "valor")),
+    },
+    "custo_geral": {
+        "texto": ("centro de custo", "descri", "hist", "fornecedor"),
+        "datas": ("data", "venc"),
+        "numericas": ("custo", "valor", "despesa"),
+        "categoricas": ("categoria", "conta", "tipo"),
+        "obrigatorias": (("valor", "custo", "despesa"),),
+    },
+    "orcamentos_nao_convertidos": {
+        "texto": ("paciente", "nome", "obs"),
+        "datas": ("data",),
+        "numericas": ("valor", "desconto", "orc"),
+        "categoricas": ("unidade", "conv", "status"),
+        "obrigatorias": (("valor",),),
+    },
+    "fidelidade": {
+        "texto": ("paciente", "nome"),
+        "datas": ("data", "ultima"),
+        "numericas": ("frequencia", "qtd", "quant"),
+        "categoricas": ("unidade", "faixa"),
+        "obrigatorias": (("frequencia", "qtd"),),
+    },
+    "extratos_bancarios": {
+        "texto": ("hist", "descri", "document"),
+        "datas": ("data",),
+        "numericas": ("valor", "saldo", "mov"),
+        "categoricas": ("conta", "banco", "tipo"),
+        "obrigatorias": (("valor", "mov"),),
+    },
+    "exames_por_convenio": {
+        "numericas": ("quant", "qtd", "valor", "fatur"),
+        "categoricas": ("conv", "exame", "procedimento"),
+        "obrigatorias": (("conv",),),
+    },
+    "exames_por_unidade": {
+        "numericas": ("quant", "qtd", "valor", "fatur"),
+        "categoricas": ("unidade", "exame", "procedimento"),
+        "obrigatorias": (("unidade",),),
+    },
+    "prazo_medio": {
+        "numericas": ("pmr", "valor", "fatur", "receita"),
+        "categoricas": ("conv",),
+        "obrigatorias": (("pmr",),),
+    },
+    "estrategia_marketing": {
+        "texto": ("campanha",),
+        "numericas": ("valor", "roi", "invest"),
+        "categoricas": ("canal",),
+    },
+    "tributos_ljp": {
+        "texto": ("tributo", "imposto"),
+        "numericas": ("aliq", "base"),
+        "obrigatorias": (("aliq",),),
+    },
+    "tributos_lmg": {
+        "texto": ("tributo", "imposto"),
+        "numericas": ("aliq", "base"),
+        "obrigatorias": (("aliq",),),
+    },
+    "meta_mes": {
+        "texto": ("mes",),
+        "numericas": ("meta", "valor", "realiz"),
+        "obrigatorias": (("meta",),),
+    },
+}
+
+
+def esquema_da_pasta(pasta):
+    """
+    Esquema registrado para a pasta; pastas sem esquema são lidas só com o formato padrão.
+    """
+    return ESQUEMAS.get(pasta, {})
+
+
+def versao_esquema(esquema):
+    """
+    Texto que muda sempre que o esquema muda (usado na versão do cache dos CSVs).
+    """
+    return json.dumps(esquema, sort_keys=True, ensure_ascii=False)
+
+
+def classificar_colunas(colunas, esquema):
+    """
+    Papel de cada coluna ({coluna: papel}); colunas fora do esquema ficam com None.
+    """
+    papeis = {}
+    for col in colunas:
+        nome = sem_acento(col)
+        casadas = [(papel, palavra) for papel in PAPEIS for palavra in esquema.get(papel, ()) if palavra in nome]
+        # Descarta as palavras contidas numa palavra mais longa de outro papel que também casou
+        especificas = [(papel, palavra) for papel, palavra in casadas
+                       if not any(palavra != outra and palavra in outra for _, outra in casadas)]
+        papeis[col] = especificas[0][0] if especificas else None
+    return papeis
+
+
+# ---------------------- LEITURA TIPADA ----------------------
+# Número simples depois da limpeza (sinal opcional, ponto como separador decimal)
+_NUMERO = r"^[+-]?(\d+\.?\d*|\.\d+)$"
+
+
+def _sem_linhas_total(lote):
+    """
+    Remove do lote (pa.RecordBatch, todo em texto) as linhas em que alguma célula
+    contenha "total", como normalizacao.remover_linhas_total.
+    """
+    linhas_total = None
+    for coluna in lote.columns:
+        contem = pc.match_substring(pc.ascii_lower(coluna), "total")
+        linhas_total = contem if linhas_total is None else pc.or_kleene(linhas_total, contem)
+    if linhas_total is None:
+        return lote
+    return lote.filter(pc.invert(pc.fill_null(linhas_total, False)))
+
+
+def _converter_numeros(coluna, formato=None):
+    """
+    Converte a coluna de texto para número; valores que não formam número viram nulos.
+    Com `formato`, aceita o padrão das exportações ("R$ 1.234,56" -> 1234.56).
+    Sem nenhum nulo e sem casas decimais, a coluna fica inteira.
+    """
+    if formato is not None:
+        coluna = pc.replace_substring_regex(coluna, rf"R\$|[{re.escape(formato['milhar'])}\s]", "")
+        coluna = pc.replace_substring(coluna, formato["decimal"], ".")
+    validos = pc.match_substring_regex(coluna, _NUMERO)
+    numeros = pc.if_else(validos, coluna, pa.scalar(None, pa.string()))
+    if numeros.null_count == 0 and not pc.any(pc.match_substring(numeros, ".")).as_py():
+        return pc.cast(numeros, pa.int64())
+    return pc.cast(numeros, pa.float64())
+
+
+def _converter_datas(coluna, formato):
+    """
+    Converte a coluna de texto para datas: formato do esquema e, para o que não
+    casar, ISO 8601 e por fim leitura flexível com o dia primeiro.
+    """
+    datas = pc.strptime(coluna, format=formato, unit="us", error_is_null=True)
+    # Ano com dois dígitos casa com %Y como o ano 25; fica para a leitura flexível
+    datas = pc.if_else(pc.less(pc.year(datas), 1000), pa.scalar(None, datas.type), datas).to_pandas()
+    textos = coluna.to_pandas()
+    for alternativa in ({"format": "ISO8601"}, {"format": "mixed", "dayfirst": True}):
+        faltando = datas.isna() & textos.notna()
+        if not faltando.any():
+            break
+        datas[faltando] = pd.to_datetime(textos[faltando], errors="coerce", **alternativa)
+    return datas
+
+
+def _tipar_lote(lote, papeis, formato, falhas):
+    """
+    Tabela Arrow do lote com os tipos do esquema; acumula em `falhas` ((papel, coluna) ->
+    [quantidade, exemplo]) os valores que não formaram número ou data.
+    """
+    colunas = {}
+    for col, original in zip(lote.schema.names, lote.columns):
+        papel = papeis[col]
+        if papel == "numericas":
+            convertido = _converter_numeros(original, formato)
+        elif papel == "datas":
+            convertido = pa.array(_converter_datas(original, formato["data"]), pa.timestamp("us"))
+        elif papel == "categoricas":
+            colunas[col] = original.dictionary_encode()
+            continue
+        else:
+            colunas[col] = original
+            continue
+        perdidos = pc.and_(original.is_valid(), convertido.is_null())
+        quantidade = pc.sum(perdidos).as_py() or 0
+        if quantidade:
+            registro = falhas.setdefault((papel, col), [0, pc.filter(original, perdidos)[0].as_py()])
+            registro[0] += quantidade
+        colunas[col] = convertido
+    return pa.table(colunas)
+
+
+def concatenar_tipados(partes):
+    """
+    Junta os lotes mantendo as colunas categóricas (as categorias de cada lote são unidas).
+    Lotes vazios (arquivos só com o cabeçalho) são ignorados; colunas que faltam em
+    algum lote ficam vazias nas linhas dele.
+    """
+    com_linhas = [parte for parte in partes if len(parte)]
+    if len(com_linhas) <= 1:
+        return com_linhas[0] if com_linhas else pd.concat(partes, ignore_index=True)
+    colunas = list(dict.fromkeys(col for parte in com_linhas for col in parte.columns))
+    categoricas = [col for col in colunas
+                   if any(col in parte and isinstance(parte[col].dtype, pd.CategoricalDtype) for parte in com_linhas)]
+    df = pd.concat([parte.drop(columns=categoricas, errors="ignore") for parte in com_linhas], ignore_index=True)
+    for col in categoricas:
+        series = []
+        for parte in com_linhas:
+            serie = parte[col] if col in parte else pd.Series(None, index=parte.index, dtype=object)
+            serie = serie.astype("category")
+            # Categorias em texto puro: lotes com tipos diferentes (ou vazios) se unem sem erro
+            series.append(serie.cat.set_categories(serie.cat.categories.astype(object)))
+        df[col] = union_categoricals(series, ignore_order=True)
+    return df[colunas]
+
+
+def divergencias_de_cabecalho(colunas, papeis, esquema):
+    """
+    Colunas obrigatórias ausentes e colunas novas (só para pastas com esquema).
+    """
+    divergencias = []
+    if not esquema:
+        return divergencias
+    nomes = [sem_acento(col) for col in colunas]
+    for palavras in esquema.get("obrigatorias", ()):
+        if not any(p in nome for nome in nomes for p in palavras):
+            divergencias.append({"tipo": "ausente", "coluna": " / ".join(palavras)})
+    for col, papel in papeis.items():
+        if papel is None:
+            divergencias.append({"tipo": "nova", "coluna": str(col)})
+    return divergencias
+
+
+def _ler_cabecalho(fluxo, formato):
+    """
+    Nomes das colunas, lidos da primeira linha do fluxo (que fica posicionado no início dos dados).
+    """
+    linha = fluxo.readline().decode(formato["encoding"]).rstrip("\r\n")
+    if not linha:
+        raise pd.errors.EmptyDataError("Arquivo CSV vazio")
+    return next(csv.reader([linha], delimiter=formato["sep"]))
+
+
+def _sem_repetidos(colunas):
+    """
+    Nomes das colunas sem repetição, como no pandas (a segunda "Valor" vira "Valor.1").
+    Retorna os nomes e a lista dos que se repetiam.
+    """
+    contagem = {}
+    nomes = []
+    repetidos = []
+    for col in colunas:
+        atual = contagem.get(col, 0)
+        if atual and col not in repetidos:
+            repetidos.append(col)
+        nome = col
+        while atual > 0:
+            contagem[nome] = atual + 1
+            nome = f"{nome}.{atual}"
+            atual = contagem.get(nome, 0)
+        nomes.append(nome)
+        contagem[nome] = atual + 1
+    return nomes, repetidos
+
+
+def _lote_das_linhas_curtas(textos, colunas, formato):
+    """
+    Lote (todo em texto) das linhas com menos campos que o cabeçalho, completadas
+    com células vazias como fazia o pd.read_csv.
+    """
+    linhas = [next(csv.reader([texto], delimiter=formato["sep"]), []) for texto in textos]
+    return pa.RecordBatch.from_arrays(
+        [pa.array([(linha[i] if i < len(linha) else None) or None for linha in linhas], pa.string())
+         for i in range(len(colunas))],
+        names=colunas,
+    )
+
+
+def ler_csv_tipado(fluxo, esquema, bytes_por_lote=BYTES_POR_LOTE):
+    """
+    Lê o CSV do fluxo (arquivo binário, lido do começo ao fim uma única vez) em
+    lotes tipados pelo esquema e sem as linhas de "total". As divergências em
+    relação ao esquema ficam em df.attrs["divergencias"], uma por tipo e coluna:
+    {"tipo": "ausente" | "nova" | "repetida" | "curta" | "numero" | "data", "coluna", "valores", "exemplo"}.
+    Nomes repetidos no cabeçalho ganham sufixo (.1, .2...) e as linhas com menos
+    campos que o cabeçalho são completadas com vazios; as que sobram depois do
+    filtro de "total" contam como divergência "curta".
+    """
+    formato = {**FORMATO_PADRAO, **esquema.get("formato", {})}
+    if not hasattr(fluxo, "peek"):
+        fluxo = io.BufferedReader(fluxo)
+    colunas, repetidas = _sem_repetidos(_ler_cabecalho(fluxo, formato))
+    papeis = classificar_colunas(colunas, esquema)
+    divergencias = [{"tipo": "repetida", "coluna": str(col)} for col in repetidas]
+    if not fluxo.peek(1):
+        # Só o cabeçalho: o leitor do pyarrow não aceita CSV sem dados
+        df = pd.DataFrame(columns=colunas)
+        df.attrs["divergencias"] = divergencias + divergencias_de_cabecalho(colunas, papeis, esquema)
+        return df
+    curtas = []
+
+    def tratar_linha_invalida(linha):
+        # Linhas curtas (ex.: "Total Geral;;1.234,56") são lidas à parte; as longas continuam erro
+        if linha.actual_columns < linha.expected_columns:
+            curtas.append(linha.text)
+            return "skip"
+        return "error"
+    # Todas as colunas como texto: os tipos vêm do esquema, não da amostra do primeiro lote
+    leitor = pacsv.open_csv(
+        fluxo,
+        read_options=pacsv.ReadOptions(encoding=formato["encoding"], column_names=colunas, block_size=bytes_por_lote),
+        parse_options=pacsv.ParseOptions(delimiter=formato["sep"], invalid_row_handler=tratar_linha_invalida),
+        convert_options=pacsv.ConvertOptions(column_types={col: pa.string() for col in colunas},
+                                             strings_can_be_null=True, quoted_strings_can_be_null=True),
+    )
+    partes = []
+    falhas = {}
+    lotes = iter(leitor)
+    while True:
+        # Inclui a espera pelos trechos do fluxo (etapa "download", quando vem do Drive)
+        with etapa("leitura_csv") as registro:
+            lote = next(lotes, None)
+            registro["linhas"] = 0 if lote is None else lote.num_rows
+        if lote is None:
+            break
+        with etapa("filtro_total", linhas=lote.num_rows):
+            lote = _sem_linhas_total(lote)
+        with etapa("tipagem", linhas=lote.num_rows):
+            partes.append(_tipar_lote(lote, papeis, formato, falhas))
+    if curtas:
+        lote = _sem_linhas_total(_lote_das_linhas_curtas(curtas, colunas, formato))
+        if lote.num_rows:
+            exemplo = formato["sep"].join(valor or "" for valor in lote.slice(0, 1).to_pylist()[0].values())
+            divergencias.append({"tipo": "curta", "coluna": "", "valores": lote.num_rows, "exemplo": exemplo})
+            partes.append(_tipar_lote(lote, papeis, formato, falhas))
+    if partes:
+        # Inteiro em um lote e decimal em outro viram double; as categorias dos lotes são unidas
+        tabela = pa.concat_tables(partes, promote_options="permissive")
+        del partes
+        for posicao, col in enumerate(tabela.column_names):
+            if papeis[col] is None:
+                # Fora do esquema: número só quando nada se perde na conversão (em todos os lotes)
+                convertido = _converter_numeros(tabela.column(posicao))
+                if convertido.null_count == tabela.column(posicao).null_count:
+                    tabela = tabela.set_column(posicao, col, convertido)
+        df = tabela.to_pandas(split_blocks=True, self_destruct=True)
+    else:
+        df = pd.DataFrame(columns=colunas)
+    divergencias += divergencias_de_cabecalho(colunas, papeis, esquema)
+    for (papel, col), (quantidade, exemplo) in falhas.items():
+        divergencias.append({"tipo": "numero" if papel == "numericas" else "data", "coluna": str(col),
+                             "valores": quantidade, "exemplo": exemplo})
+    df.attrs["divergencias"] = divergencias
+    return df
+
+
+def descrever_divergencias(divergencias_por_arquivo):
+    """
+    Textos de aviso agregando as divergências de vários arquivos da mesma pasta:
+    lista de (nome do arquivo, divergências) -> uma linha por tipo e coluna.
+    """
+    agregadas = {}
+    for _, divergencias in divergencias_por_arquivo:
+        for divergencia in divergencias:
+            chave = (divergencia["tipo"], divergencia["coluna"])
+            registro = agregadas.setdefault(chave, {"arquivos": 0, "valores": 0, "exemplo": divergencia.get("exemplo")})
+            registro["arquivos"] += 1
+            registro["valores"] += divergencia.get("valores", 0)
+    total = len(divergencias_por_arquivo)
+    textos = []
+    for (tipo, coluna), registro in agregadas.items():
+        em = f"em {registro['arquivos']} de {total} arquivo(s)"
+        if tipo == "ausente":
+            textos.append(f"coluna obrigatória ausente ({coluna}) {em}")
+        elif tipo == "nova":
+            textos.append(f"coluna fora do esquema \"{coluna}\" {em}")
+        elif tipo == "repetida":
+            textos.append(f"coluna \"{coluna}\" repetida no cabeçalho (lida como \"{coluna}.1\"...) {em}")
+        elif tipo == "curta":
+            textos.append(f"{registro['valores']} linha(s) com menos campos que o cabeçalho, completadas com vazios "
+                          f"(ex.: \"{registro['exemplo']}\") {em}")
+        else:
+            descricao = "número" if tipo == "numero" else "data"
+            textos.append(f"{registro['valores']} valor(es) de \"{coluna}\" não lido(s) como {descricao} "
+                          f"(ex.: \"{registro['exemplo']}\") {em}")
+    return textos
+
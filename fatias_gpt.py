@@ -0,0 +1,185 @@
+import json
+import hashlib
+
+from normalizacao import localizar_coluna
+from payload_gpt import PLANILHAS_POR_ANALISE, contar_tokens, montar_payload
+
+# ---------------------- RELATÓRIO EM FATIAS (MAPA E REDUÇÃO) ----------------------
+# Em vez de um único prompt pedindo tudo de uma vez, o relatório pode ser gerado
+# em duas fases. No mapa, cada fatia (uma unidade, um convênio ou uma análise
+# marcada) vira um pedido curto e independente ao GPT, com resposta limitada a
+# TOKENS_RESPOSTA_FATIA, e todas correm ao mesmo tempo. Na redução, uma chamada
+# final escreve só o sumário executivo a partir dos relatórios parciais, que são
+# anexados ao relatório logo depois dele. O tempo total passa a ser o da fatia
+# mais lenta mais o do sumário, em vez de crescer com o tamanho do relatório.
+#
+# Cada fatia é identificada pelo hash das suas mensagens: a mesma fatia com os
+# mesmos dados é reaproveitada do cache e só as fatias que falharam são pedidas
+# de novo.
+
+# Unidades/convênios com fatia própria (os de maior receita); os demais dividem uma fatia
+MAX_FATIAS_POR_DIMENSAO = 4
+# Limite de tokens dos dados de cada fatia e das respostas
+ORCAMENTO_TOKENS_FATIA = 2500
+TOKENS_RESPOSTA_FATIA = 600
+TOKENS_RESPOSTA_CONSOLIDACAO = 600
+# Limite de tokens dos relatórios parciais no prompt da consolidação
+ORCAMENTO_TOKENS_PARCIAIS = 5000
+
+MENSAGEM_SISTEMA = "Você é um consultor financeiro e estratégico para o Laboratório João Paulo."
+
+# Dimensões com uma fatia por valor: (nome, palavras da coluna nas planilhas, tabela dos indicadores, coluna da tabela)
+DIMENSOES_FATIAS = (
+    ("Unidade", ("unidade",), "por_unidade", "unidade"),
+    ("Convênio", ("conv",), "por_convenio", "convenio"),
+)
+# Coberta pelas fatias de unidade e convênio
+ANALISE_POR_DIMENSAO = "Rentabilidade"
+
+
+def impressao_fatia(mensagens, modelo, max_tokens):
+    """
+    Hash SHA-256 do pedido da fatia (mensagens, modelo e limite da resposta).
+    """
+    texto = json.dumps({"mensagens": mensagens, "modelo": modelo, "max_tokens": max_tokens},
+                       sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _cabecalho(periodo):
+    return f"Você é o CFO do Laboratório João Paulo. Os dados a seguir referem-se ao período de {periodo['inicio']} a {periodo['fim']}.\n"
+
+
+def _fatia(chave, titulo, prompt, modelo):
+    mensagens = [
+        {"role": "system", "content": MENSAGEM_SISTEMA},
+        {"role": "user", "content": prompt},
+    ]
+    return {
+        "chave": chave,
+        "titulo": titulo,
+        "mensagens": mensagens,
+        "max_tokens": TOKENS_RESPOSTA_FATIA,
+        "impressao": impressao_fatia(mensagens, modelo, TOKENS_RESPOSTA_FATIA),
+    }
+
+
+def _grupos(tabela, coluna):
+    """
+    Valores da dimensão com fatia própria (maior receita primeiro) e os que
+    ficam na fatia "demais".
+    """
+    valores = tabela.sort_values("receita", ascending=False)[coluna].astype(str).tolist()
+    return valores[:MAX_FATIAS_POR_DIMENSAO], valores[MAX_FATIAS_POR_DIMENSAO:]
+
+
+def _filtrar(dados, palavras, valores):
+    """
+    Linhas de cada planilha com a dimensão entre os valores; planilhas sem a coluna ficam de fora.
+    """
+    filtrados = {}
+    for chave, df in dados.items():
+        col = localizar_coluna(df, *palavras)
+        if col is not None:
+            filtrados[chave] = df[df[col].astype(str).isin(valores)]
+    return filtrados
+
+
+def _fatias_da_dimensao(dados, periodo, opcoes_analise, indicadores, dimensao, modelo):
+    nome, palavras, chave_tabela, coluna = dimensao
+    tabela = indicadores.get(chave_tabela)
+    if tabela is None or tabela.empty:
+        return []
+    proprios, demais = _grupos(tabela, coluna)
+    grupos = [(valor, f"{nome} {valor}", [valor]) for valor in proprios]
+    if demais:
+        grupos.append(("demais", f"{nome}: demais ({len(demais)})", demais))
+    fatias = []
+    for chave, titulo, valores in grupos:
+        linhas = tabela[tabela[coluna].astype(str).isin(valores)]
+        resumo_dados, _ = montar_payload(_filtrar(dados, palavras, valores), opcoes_analise, ORCAMENTO_TOKENS_FATIA, modelo)
+        prompt = (
+            _cabecalho(periodo)
+            + f"Analise somente {titulo}: rentabilidade teórica e real, margem de contribuição, ticket médio, "
+              f"volume, o que está lucrativo ou não e o que pode ser ajustado.\n"
+              f"- Tributos incidem sobre o preço faturado: LJP (Lucro Presumido) e LMG (Simples Nacional).\n"
+              f"- Unidade Domiciliar VIP: 10% de comissão médica e R$60 por paciente para coleta.\n"
+              f"Seja objetivo, em tópicos curtos; este texto será uma seção de um relatório maior.\n\n"
+              f"Indicadores já calculados (use estes números, não os recalcule):\n"
+              f"{linhas.round(4).to_csv(index=False, sep=';')}"
+        )
+        if resumo_dados:
+            prompt += f"\nResumo dos dados (valores agregados, separador ';'):\n{resumo_dados}"
+        fatias.append(_fatia(f"{coluna}:{chave}", titulo, prompt, modelo))
+    return fatias
+
+
+def montar_fatias(dados, periodo, opcoes_analise, indicadores, modelo):
+    """
+    Fatias do relatório: uma por unidade e por convênio (a partir das tabelas de
+    rentabilidade dos indicadores) e uma por análise marcada. Cada fatia é
+    {"chave", "titulo", "mensagens", "max_tokens", "impressao"}.
+    """
+    fatias = []
+    for dimensao in DIMENSOES_FATIAS:
+        fatias.extend(_fatias_da_dimensao(dados, periodo, opcoes_analise, indicadores, dimensao, modelo))
+
+    consolidados = json.dumps(indicadores["consolidados"], ensure_ascii=False, default=float)
+    for analise in opcoes_analise:
+        if analise == ANALISE_POR_DIMENSAO and fatias:
+            continue
+        planilhas = PLANILHAS_POR_ANALISE.get(analise, list(dados))
+        resumo_dados, _ = montar_payload({chave: dados[chave] for chave in planilhas if chave in dados},
+                                         [analise], ORCAMENTO_TOKENS_FATIA, modelo)
+        prompt = (
+            _cabecalho(periodo)
+            + f"Analise somente: {analise}. Traga insights, projeções e o que pode ser ajustado.\n"
+              f"Seja objetivo, em tópicos curtos; este texto será uma seção de um relatório maior.\n\n"
+              f"Indicadores consolidados já calculados (use estes números, não os recalcule; "
+              f"valores nulos não puderam ser calculados):\n{consolidados}\n"
+        )
+        if resumo_dados:
+            prompt += f"\nResumo dos dados por planilha (valores agregados, separador ';'):\n{resumo_dados}"
+        fatias.append(_fatia(f"analise:{analise}", analise, prompt, modelo))
+    return fatias
+
+
+def _limitar(texto, tokens, modelo):
+    """
+    Corta o texto para caber em aproximadamente `tokens` tokens.
+    """
+    if contar_tokens(texto, modelo) <= tokens:
+        return texto
+    return texto[:tokens * 4].rstrip() + " [...]"
+
+
+def montar_consolidacao(periodo, opcoes_analise, indicadores, parciais, modelo):
+    """
+    Mensagens da chamada de redução: o sumário executivo escrito a partir dos
+    relatórios parciais ({"titulo", "texto", "erro"}); os parciais com erro ficam de fora.
+    """
+    validos = [parcial for parcial in parciais if not parcial["erro"]]
+    limite = ORCAMENTO_TOKENS_PARCIAIS // max(len(validos), 1)
+    textos = "\n\n".join(f"### {parcial['titulo']}\n{_limitar(parcial['texto'], limite, modelo)}" for parcial in validos)
+    prompt = (
+        _cabecalho(periodo)
+        + f"Análises solicitadas: {', '.join(opcoes_analise) or 'visão geral'}.\n"
+          f"Abaixo estão relatórios parciais, cada um sobre uma unidade, um convênio ou uma análise do período. "
+          f"Escreva o sumário executivo do relatório estratégico: as principais conclusões, quais unidades e "
+          f"convênios estão lucrativos ou não, os riscos e as recomendações prioritárias que cruzam os parciais. "
+          f"Não repita os detalhes: os parciais serão anexados logo depois do seu texto.\n\n"
+          f"Indicadores consolidados já calculados (use estes números, não os recalcule):\n"
+          f"{json.dumps(indicadores['consolidados'], ensure_ascii=False, default=float)}\n\n"
+          f"Relatórios parciais:\n{textos}"
+    )
+    return [
+        {"role": "system", "content": MENSAGEM_SISTEMA},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def anexar_parciais(parciais):
+    """
+    Texto das seções anexadas depois do sumário, uma por fatia, na ordem das fatias.
+    """
+    return "".join(f"\n\n---\n\n## {parcial['titulo']}\n\n{parcial['texto']}" for parcial in parciais)
@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import shutil
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from indice_pastas import extrair_data
+from normalizacao import VERSAO_NORMALIZACAO, localizar_coluna
+
+# ---------------------- HISTÓRICO INCREMENTAL DA PRODUÇÃO ----------------------
+# As planilhas diárias de produção são acumuladas em Parquet particionado por dia
+# (<fonte>/dia=AAAA-MM-DD/<file_id>.parquet). Cada arquivo do Drive é ingerido uma única
+# vez (controle por id + md5/modifiedTime no manifesto da fonte); um dia
+# reexportado substitui a partição inteira daquele dia. As consultas por período
+# usam os filtros do pyarrow.dataset: as partições fora do período nem são abertas.
+# O manifesto registra a versão da normalização: quando ela muda, o histórico da
+# fonte é descartado e reconstruído na próxima sincronização.
+# Gravação e consulta de uma fonte não se sobrepõem (um lock por fonte): a
+# reexportação de um dia apaga a partição, e uma consulta no meio dela tentaria
+# abrir arquivos que já não existem.
+
+PARTICAO = ds.partitioning(pa.schema([("dia", pa.string())]), flavor="hive")
+
+
+def _tipo_comum(anterior, novo):
+    """
+    Tipo Arrow que acomoda as duas exportações: inteiro com decimal vira double,
+    datas ficam em microssegundos e qualquer outra divergência é lida como texto.
+    """
+    if anterior in (None, novo):
+        return novo
+    numericos = ("int", "uint", "float", "double")
+    if anterior.startswith(numericos) and novo.startswith(numericos):
+        return "double"
+    if anterior.startswith("timestamp") and novo.startswith("timestamp"):
+        return "timestamp[us]"
+    return "string"
+
+
+def _versao(arquivo):
+    return f"{arquivo.get('md5Checksum', '')}|{arquivo.get('modifiedTime', '')}"
+
+
+def datas_das_linhas(df, arquivo):
+    """
+    Data (ISO) de cada linha: coluna de data da planilha e, quando ausente ou
+    inválida, a data do nome do arquivo ou do seu modifiedTime.
+    """
+    data_arquivo = extrair_data(arquivo.get("name", ""))
+    if data_arquivo is None:
+        data_arquivo = datetime.fromisoformat(arquivo["modifiedTime"][:10]).date()
+    col = localizar_coluna(df, "data", excluir=("data_arquivo",))
+    if col is None:
+        return pd.Series(data_arquivo.isoformat(), index=df.index)
+    if pd.api.types.is_datetime64_any_dtype(df[col]):
+        datas = df[col]
+    else:
+        datas = pd.to_datetime(df[col].astype(str), dayfirst=True, errors="coerce", format="mixed")
+    return datas.dt.strftime("%Y-%m-%d").fillna(data_arquivo.isoformat())
+
+
+class HistoricoProducao:
+    """
+    Histórico local das planilhas diárias de produção, uma pasta por fonte.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self._locks = {}
+        self._lock_geral = threading.Lock()
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def _lock(self, fonte):
+        with self._lock_geral:
+            return self._locks.setdefault(fonte, threading.Lock())
+
+    def _pasta_fonte(self, fonte):
+        if not re.fullmatch(r"\w+", fonte):
+            raise ValueError(f"Nome de fonte inválido: {fonte}")
+        return os.path.join(self.pasta, fonte)
+
+    def _caminho_manifesto(self, fonte):
+        return os.path.join(self.pasta, f"{fonte}_manifesto.json")
+
+    def _ler_manifesto(self, fonte):
+        """
+        Manifesto da fonte: {"normalizacao", "arquivos": {file_id: {versao, nome, dias,
+        linhas, divergencias}}, "colunas": {nome: tipo Arrow}}. Um manifesto de outra
+        versão da normalização é tratado como vazio.
+        """
+        try:
+            with open(self._caminho_manifesto(fonte), encoding="utf-8") as arquivo:
+                manifesto = json.load(arquivo)
+            if manifesto.get("normalizacao") == VERSAO_NORMALIZACAO:
+                return manifesto
+        except (OSError, ValueError):
+            pass
+        return {"normalizacao": VERSAO_NORMALIZACAO, "arquivos": {}, "colunas": {}}
+
+    def _gravar_manifesto(self, fonte, manifesto):
+        temporario = f"{self._caminho_manifesto(fonte)}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(manifesto, arquivo, ensure_ascii=False)
+        os.replace(temporario, self._caminho_manifesto(fonte))
+
+    def arquivos_pendentes(self, fonte, arquivos):
+        """
+        Filtra os arquivos que ainda não foram ingeridos ou mudaram desde a ingestão,
+        do mais antigo para o mais recente.
+        """
+        vistos = self._ler_manifesto(fonte)["arquivos"]
+        pendentes = [arq for arq in arquivos if vistos.get(arq["id"], {}).get("versao") != _versao(arq)]
+        return sorted(pendentes, key=lambda arq: arq.get("modifiedTime", ""))
+
+    def arquivos_no_periodo(self, fonte, arquivos, inicio, fim):
+        """
+        Filtra os arquivos cujas linhas no histórico caem entre as datas (inclusive).
+        """
+        vistos = self._ler_manifesto(fonte)["arquivos"]
+        inicio, fim = str(inicio), str(fim)
+        return [
+            arq for arq in arquivos
+            if any(inicio <= dia <= fim for dia in vistos.get(arq["id"], {}).get("dias", []))
+        ]
+
+    def divergencias(self, fonte, arquivos):
+        """
+        Divergências com o esquema registradas na ingestão: lista de (nome do arquivo, divergências).
+        """
+        vistos = self._ler_manifesto(fonte)["arquivos"]
+        return [(arq.get("name"), vistos.get(arq["id"], {}).get("divergencias", [])) for arq in arquivos]
+
+    def ingerir(self, fonte, arquivo, df):
+        """
+        Grava as linhas do arquivo, substituindo as linhas anteriores do mesmo arquivo
+        e as partições dos dias que ele cobre (reexportação). Retorna o número de linhas gravadas.
+        """
+        pasta_fonte = self._pasta_fonte(fonte)
+        df = df.drop(columns=[c for c in df.columns if c in ("dia", "data_arquivo")])
+        df.columns = [str(c) for c in df.columns]
+        # Texto, categorias e valores mistos viram string; números, booleanos e datas mantêm o tipo
+        for col in df.columns:
+            if not (pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col])
+                    or pd.api.types.is_datetime64_any_dtype(df[col])):
+                df[col] = df[col].astype("string")
+        dias = datas_das_linhas(df, arquivo)
+
+        with self._lock(fonte):
+            manifesto = self._ler_manifesto(fonte)
+            if not manifesto["arquivos"]:
+                # Histórico vazio ou de outra versão da normalização: começa do zero
+                shutil.rmtree(pasta_fonte, ignore_errors=True)
+            # Versão anterior do mesmo arquivo
+            anterior = manifesto["arquivos"].pop(arquivo["id"], None)
+            if anterior:
+                for dia in anterior["dias"]:
+                    caminho = os.path.join(pasta_fonte, f"dia={dia}", f"{arquivo['id']}.parquet")
+                    if os.path.exists(caminho):
+                        os.remove(caminho)
+            for dia, linhas_dia in df.groupby(dias, sort=True):
+                pasta_dia = os.path.join(pasta_fonte, f"dia={dia}")
+                # Reexportação: o arquivo mais recente substitui o dia inteiro
+                shutil.rmtree(pasta_dia, ignore_errors=True)
+                for registro in manifesto["arquivos"].values():
+                    if dia in registro["dias"]:
+                        registro["dias"].remove(dia)
+                os.makedirs(pasta_dia)
+                tabela = pa.Table.from_pandas(linhas_dia, preserve_index=False)
+                pq.write_table(tabela, os.path.join(pasta_dia, f"{arquivo['id']}.parquet"))
+                for campo in tabela.schema:
+                    tipo = str(campo.type) if campo.type != pa.null() else "string"
+                    manifesto["colunas"][campo.name] = _tipo_comum(manifesto["colunas"].get(campo.name), tipo)
+            manifesto["arquivos"][arquivo["id"]] = {
+                "versao": _versao(arquivo),
+                "nome": arquivo.get("name"),
+                "dias": sorted(dias.unique().tolist()),
+                "linhas": len(df),
+                "divergencias": df.attrs.get("divergencias", []),
+            }
+            self._gravar_manifesto(fonte, manifesto)
+        return len(df)
+
+    def consultar(self, fonte, inicio, fim):
+        """
+        Linhas da fonte entre as datas (inclusive), com a data de cada linha na coluna "_data".
+        Retorna None se a fonte ainda não tiver histórico.
+        """
+        pasta_fonte = self._pasta_fonte(fonte)
+        filtro = (ds.field("dia") >= str(inicio)) & (ds.field("dia") <= str(fim))
+        with self._lock(fonte):
+            colunas = self._ler_manifesto(fonte)["colunas"]
+            if not colunas or not os.path.isdir(pasta_fonte):
+                return None
+            esquema = pa.schema([(nome, pa.type_for_alias(tipo)) for nome, tipo in colunas.items()] + [("dia", pa.string())])
+            dataset = ds.dataset(pasta_fonte, format="parquet", partitioning=PARTICAO, schema=esquema)
+            tabela = dataset.to_table(filter=filtro)
+        return tabela.to_pandas().rename(columns={"dia": "_data"})
@@ -0,0 +1,340 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from normalizacao import localizar_coluna, sem_acento, tratar_valores_numericos
+
+# ---------------------- MOTOR LOCAL DE INDICADORES ----------------------
+# Calcula os indicadores consolidados a partir dos DataFrames já carregados do
+# Drive, com operações vetorizadas do pandas. As colunas são localizadas por
+# palavras-chave (sem acento e sem diferenciar maiúsculas), como no restante do
+# app, pois os nomes exatos variam entre as exportações. Indicadores que
+# dependem de dados ausentes ficam como None; o GPT só escreve a narrativa.
+
+# Regras da Unidade Domiciliar VIP
+COMISSAO_MEDICA_VIP = 0.10
+CUSTO_COLETA_VIP_POR_PACIENTE = 60.0
+
+# Quando a produção não traz a coluna de empresa, o regime de cada unidade vem do
+# segredo opcional UNIDADES_LMG: as unidades listadas são faturadas pela LMG
+# (Simples Nacional) e as demais pela LJP (Lucro Presumido). Sem coluna de empresa
+# nem unidades configuradas, e com alíquotas diferentes nas duas planilhas de
+# tributos, o regime é desconhecido: tributos e margens ficam como None.
+AVISO_REGIME_DESCONHECIDO = ("Tributos e margens não calculados: a produção não informa a empresa (LJP ou LMG) "
+                             "e o segredo UNIDADES_LMG não foi configurado.")
+
+
+def _contem(serie, palavra):
+    """
+    Máscara booleana das linhas cujo texto (sem acento) contém a palavra.
+    Avalia apenas os valores distintos da coluna.
+    """
+    codigos, unicos = pd.factorize(serie)
+    contem = np.array([palavra in sem_acento(valor) for valor in unicos] + [False], dtype=bool)
+    return contem[codigos]
+
+
+def _pertence(serie, valores):
+    """
+    Máscara booleana das linhas cujo texto (sem acento e sem espaços nas pontas)
+    é um dos valores informados. Avalia apenas os valores distintos da coluna.
+    """
+    valores = {sem_acento(valor).strip() for valor in valores}
+    codigos, unicos = pd.factorize(serie)
+    pertence = np.array([sem_acento(valor).strip() in valores for valor in unicos] + [False], dtype=bool)
+    return pertence[codigos]
+
+
+def _numerico(df, col):
+    """
+    Retorna a coluna como Series numérica, convertendo o formato brasileiro se preciso.
+    """
+    if pd.api.types.is_numeric_dtype(df[col]):
+        return df[col].astype(float)
+    return tratar_valores_numericos(df[[col]].copy(), [col])[col].astype(float)
+
+
+def _soma(df, *palavras, excluir=()):
+    col = localizar_coluna(df, *palavras, excluir=excluir)
+    if col is None:
+        return None
+    return float(_numerico(df, col).sum())
+
+
+def _dividir(numerador, denominador):
+    if numerador is None or denominador is None or denominador == 0:
+        return None
+    return numerador / denominador
+
+
+def aliquota_efetiva(df_tributos):
+    """
+    Soma das alíquotas da planilha de tributos, em fração do preço faturado.
+    Alíquotas informadas em percentual (ex.: 3,65) são convertidas para fração.
+    """
+    col = localizar_coluna(df_tributos, "aliq")
+    if col is None:
+        return 0.0
+    aliquotas = _numerico(df_tributos, col).dropna()
+    if aliquotas.empty:
+        return 0.0
+    if aliquotas.max() > 1:
+        aliquotas = aliquotas / 100
+    return float(aliquotas.sum())
+
+
+def _volume(df):
+    """
+    Quantidade de exames por linha: coluna de quantidade ou 1 exame por linha.
+    """
+    col = localizar_coluna(df, "quant", "qtd", excluir=("paciente",))
+    if col is None:
+        return pd.Series(1.0, index=df.index)
+    return _numerico(df, col).fillna(0)
+
+
+def _pacientes(df):
+    """
+    Número de pacientes: soma da coluna numérica de pacientes, contagem de
+    identificadores distintos ou, sem a coluna, o número de linhas.
+    """
+    col = localizar_coluna(df, "paciente")
+    if col is None:
+        return float(len(df))
+    if any(p in sem_acento(col) for p in ("qtd", "quant", "num")):
+        return float(_numerico(df, col).sum())
+    return float(df[col].nunique())
+
+
+def preparar_producao(df_producao, aliquota_ljp, aliquota_lmg, unidades_lmg=()):
+    """
+    Monta a base linha a linha da produção com receita, custo variável, tributos e
+    despesas da Domiciliar VIP já calculados, pronta para agrupamentos.
+    Tributos e margem ficam NaN quando o regime das linhas não pode ser determinado.
+    """
+    col_receita = localizar_coluna(df_producao, "fatur", "valor", excluir=("custo",))
+    if col_receita is None:
+        return None
+    base = pd.DataFrame(index=df_producao.index)
+    base["receita"] = _numerico(df_producao, col_receita).fillna(0)
+    col_custo = localizar_coluna(df_producao, "custo")
+    base["custo_variavel"] = _numerico(df_producao, col_custo).fillna(0) if col_custo else 0.0
+    base["exames"] = _volume(df_producao)
+
+    col_unidade = localizar_coluna(df_producao, "unidade")
+    col_convenio = localizar_coluna(df_producao, "conv")
+    base["unidade"] = df_producao[col_unidade].astype(str) if col_unidade else "Geral"
+    base["convenio"] = df_producao[col_convenio].astype(str) if col_convenio else "Geral"
+    col_paciente = localizar_coluna(df_producao, "paciente")
+    if col_paciente is not None:
+        base["paciente"] = df_producao[col_paciente]
+
+    # Tributos sobre o preço faturado conforme o regime da empresa (LJP ou LMG)
+    col_empresa = localizar_coluna(df_producao, "empresa")
+    if col_empresa is not None:
+        base["tributos"] = base["receita"] * np.where(_contem(df_producao[col_empresa], "lmg"), aliquota_lmg, aliquota_ljp)
+    elif unidades_lmg:
+        base["tributos"] = base["receita"] * np.where(_pertence(base["unidade"], unidades_lmg), aliquota_lmg, aliquota_ljp)
+    elif aliquota_lmg and aliquota_lmg != aliquota_ljp:
+        base["tributos"] = np.nan
+    else:
+        base["tributos"] = base["receita"] * aliquota_ljp
+
+    # Domiciliar VIP: comissão médica sobre a receita e custo fixo de coleta por paciente
+    vip = _contem(base["unidade"], "domiciliar")
+    base["despesas_vip"] = np.where(vip, base["receita"] * COMISSAO_MEDICA_VIP, 0.0)
+    if vip.any():
+        pacientes_vip = _pacientes(df_producao[vip])
+        linhas_vip = vip.sum()
+        base.loc[vip, "despesas_vip"] += CUSTO_COLETA_VIP_POR_PACIENTE * pacientes_vip / linhas_vip
+
+    base["margem_contribuicao"] = base["receita"] - base["custo_variavel"] - base["tributos"] - base["despesas_vip"]
+    return base
+
+
+def rentabilidade_por(base, chave):
+    """
+    Rentabilidade agrupada por "unidade" ou "convenio": receita, custos, tributos,
+    margem de contribuição (valor e %), volume e ticket médio por exame.
+    """
+    colunas = ["receita", "custo_variavel", "tributos", "despesas_vip", "margem_contribuicao", "exames"]
+    tabela = base.groupby(chave, sort=False)[colunas].sum(min_count=1)
+    tabela["margem_contribuicao_pct"] = tabela["margem_contribuicao"] / tabela["receita"].replace(0, np.nan)
+    tabela["ticket_medio_exame"] = tabela["receita"] / tabela["exames"].replace(0, np.nan)
+    return tabela.sort_values("margem_contribuicao", ascending=False).reset_index()
+
+
+def _ticket_e_volume(df_producao_conv, base):
+    """
+    Ticket médio, exames e pacientes separados entre convênios e particulares.
+    Usa a produção por convênio quando disponível e, senão, a produção geral.
+    """
+    resultado = {}
+    if df_producao_conv is not None and localizar_coluna(df_producao_conv, "conv") is not None:
+        df = df_producao_conv
+        col_receita = localizar_coluna(df, "fatur", "valor", excluir=("custo",))
+        receita = _numerico(df, col_receita).fillna(0) if col_receita else pd.Series(0.0, index=df.index)
+        exames = _volume(df)
+        particular = _contem(df[localizar_coluna(df, "conv")], "particular")
+    elif base is not None:
+        df = base
+        receita, exames = base["receita"], base["exames"]
+        particular = _contem(base["convenio"], "particular")
+    else:
+        return resultado
+    for sufixo, filtro in (("Conv", ~particular), ("Part", particular)):
+        pacientes = _pacientes(df[filtro])
+        resultado[f"NumExames_{sufixo}"] = float(exames[filtro].sum())
+        resultado[f"NumPacientes_{sufixo}"] = pacientes
+        resultado[f"TicketMedio_{sufixo}"] = _dividir(float(receita[filtro].sum()), pacientes)
+    return resultado
+
+
+def _desconto_medio(df_orcamentos):
+    """
+    Percentual médio de desconto dos orçamentos. Colunas em percentual são
+    promediadas; colunas em reais são divididas pelo valor bruto orçado.
+    """
+    col_desconto = localizar_coluna(df_orcamentos, "desconto")
+    if col_desconto is None:
+        return None
+    desconto = _numerico(df_orcamentos, col_desconto).abs()
+    nome = sem_acento(col_desconto)
+    if "%" in nome or "perc" in nome:
+        media = desconto.mean()
+        return float(media / 100 if media > 1 else media)
+    valor = _soma(df_orcamentos, "valor", excluir=("desconto",))
+    return _dividir(float(desconto.sum()), (valor or 0) + float(desconto.sum()))
+
+
+def _prazo_medio(df_pmr):
+    """
+    Prazo médio de recebimento em dias, ponderado pela receita quando possível.
+    """
+    col_pmr = localizar_coluna(df_pmr, "pmr")
+    if col_pmr is None:
+        return None
+    prazos = _numerico(df_pmr, col_pmr)
+    col_peso = localizar_coluna(df_pmr, "fatur", "valor", "receita", excluir=("pmr",))
+    if col_peso is not None:
+        pesos = _numerico(df_pmr, col_peso).fillna(0)
+        if pesos.sum() > 0:
+            return float((prazos.fillna(0) * pesos).sum() / pesos[prazos.notna()].sum())
+    return float(prazos.mean())
+
+
+def _total(base, coluna):
+    """
+    Soma da coluna da base, ou None sem base ou com a coluna indeterminada (NaN).
+    """
+    if base is None or base[coluna].isna().any():
+        return None
+    return float(base[coluna].sum())
+
+
+def calcular_indicadores(dfs, periodo, unidades_lmg=(), producao_mes=None):
+    """
+    Calcula os indicadores do período a partir dos DataFrames carregados.
+
+    `dfs` usa as mesmas chaves de `dados` no app (producao_geral, custo_geral,
+    orcamentos, producao_conv, tributos_ljp, tributos_lmg, meta_mes, extratos, pmr).
+    `unidades_lmg` lista as unidades faturadas pela LMG (ver AVISO_REGIME_DESCONHECIDO).
+    `producao_mes` é a produção geral do dia 1 do mês até o fim do período: a meta é
+    mensal e é comparada com a receita acumulada no mês, não só com a do período
+    (sem ela, FaltanteMeta e Meta_Atingida ficam como None).
+    Retorna {"consolidados": dict no formato da planilha de indicadores,
+    "por_unidade": DataFrame, "por_convenio": DataFrame, "avisos": [textos]}.
+    """
+    aliquota_ljp = aliquota_efetiva(dfs.get("tributos_ljp"))
+    aliquota_lmg = aliquota_efetiva(dfs.get("tributos_lmg"))
+    df_producao = dfs.get("producao_geral")
+    base = preparar_producao(df_producao, aliquota_ljp, aliquota_lmg, unidades_lmg) if df_producao is not None else None
+    avisos = []
+    if base is not None and base["tributos"].isna().any():
+        avisos.append(AVISO_REGIME_DESCONHECIDO)
+
+    receita = _total(base, "receita")
+    margem = _total(base, "margem_contribuicao")
+    exames = _total(base, "exames")
+    custos_fixos = _soma(dfs.get("custo_geral"), "valor", "custo", "despesa")
+    ebitda = margem - custos_fixos if margem is not None and custos_fixos is not None else None
+    margem_pct = _dividir(margem, receita)
+
+    # Ponto de equilíbrio pela margem de contribuição média ponderada por exame
+    contribuicao_por_exame = _dividir(margem, exames)
+    ponto_equilibrio_exames = _dividir(custos_fixos, contribuicao_por_exame)
+    ponto_equilibrio_valor = _dividir(custos_fixos, margem_pct)
+
+    df_orcamentos = dfs.get("orcamentos")
+    num_orcamentos = float(len(df_orcamentos)) if df_orcamentos is not None else None
+    perda_financeira = _soma(df_orcamentos, "valor", excluir=("desconto",))
+    volume = _ticket_e_volume(dfs.get("producao_conv"), base)
+    atendimentos = None
+    if "NumPacientes_Conv" in volume:
+        atendimentos = volume["NumPacientes_Conv"] + volume["NumPacientes_Part"]
+    taxa_conversao = None
+    if atendimentos is not None and num_orcamentos is not None:
+        taxa_conversao = _dividir(atendimentos, atendimentos + num_orcamentos)
+
+    meta = _soma(dfs.get("meta_mes"), "meta")
+    receita_mes = _soma(producao_mes, "fatur", "valor", excluir=("custo",))
+    faltante_meta = max(meta - receita_mes, 0.0) if meta is not None and receita_mes is not None else None
+
+    fluxo_caixa_real = _soma(dfs.get("extratos"), "valor", "mov", excluir=("saldo",))
+    ciclo_financeiro = _prazo_medio(dfs.get("pmr"))
+    capital_giro = None
+    if ciclo_financeiro is not None and receita is not None:
+        dias = (date.fromisoformat(periodo["fim"]) - date.fromisoformat(periodo["inicio"])).days + 1
+        capital_giro = receita / max(dias, 1) * ciclo_financeiro
+
+    consolidados = {
+        "Data_Analise": f"{periodo['inicio']} a {periodo['fim']}",
+        "Receita_Bruta": receita,
+        "Tributos": _total(base, "tributos"),
+        "Custos_Fixos": custos_fixos,
+        "Rentabilidade_Geral": _dividir(ebitda, receita),
+        "EBITDA": ebitda,
+        "Margem_Contribuicao": margem_pct,
+        "PontoEquilibrio_Geral": ponto_equilibrio_valor,
+        "PontoEquilibrio_PorExame": ponto_equilibrio_exames,
+        "TicketMedio_Conv": volume.get("TicketMedio_Conv"),
+        "TicketMedio_Part": volume.get("TicketMedio_Part"),
+        "FluxoCaixa_Real": fluxo_caixa_real,
+        "FluxoCaixa_Proj": None,
+        "CapitalGiro": capital_giro,
+        "CicloFinanceiro": ciclo_financeiro,
+        "IndiceLiquidez": None,
+        "ElasticidadePreco": None,
+        "DescontoMedio": _desconto_medio(df_orcamentos),
+        "TaxaConversao": taxa_conversao,
+        "NumExames_Conv": volume.get("NumExames_Conv"),
+        "NumExames_Part": volume.get("NumExames_Part"),
+        "NumPacientes_Conv": volume.get("NumPacientes_Conv"),
+        "NumPacientes_Part": volume.get("NumPacientes_Part"),
+        "NumOrcamentos": num_orcamentos,
+        "PerdaFinanceira": perda_financeira,
+        "Meta_Atingida": faltante_meta == 0 if faltante_meta is not None else None,
+        "FaltanteMeta": faltante_meta,
+    }
+    return {
+        "consolidados": consolidados,
+        "por_unidade": rentabilidade_por(base, "unidade") if base is not None else None,
+        "por_convenio": rentabilidade_por(base, "convenio") if base is not None else None,
+        "avisos": avisos,
+    }
+
+
+def formatar_reais(valor):
+    """
+    Formata o valor no padrão brasileiro (R$ 1.234,56); None vira "n/d".
+    """
+    if valor is None or pd.isna(valor):
+        return "n/d"
+    return "R$ " + f"{valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def formatar_percentual(valor):
+    if valor is None or pd.isna(valor):
+        return "n/d"
+    return f"{valor * 100:.1f}%".replace(".", ",")
@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import time
+import threading
+from datetime import date
+
+from rastreamento import etapa
+
+# ---------------------- ÍNDICE DAS PASTAS DO DRIVE ----------------------
+# Guarda a listagem completa (paginada) dos CSVs de cada pasta e o mapa
+# data -> arquivo extraído dos nomes. Entre duas listagens completas, só os
+# arquivos com modifiedTime posterior ao último conhecido são consultados, o que
+# normalmente devolve uma página vazia. Remoções aparecem na listagem completa
+# seguinte (VALIDADE_LISTAGEM_COMPLETA).
+# Com um vigia (vigia_drive.VigiaDrive) em dia, as mudanças chegam pelo feed do
+# Drive e a pasta já listada é respondida sem nenhuma chamada.
+
+VALIDADE_LISTAGEM_COMPLETA = 3600  # segundos
+CAMPOS_ARQUIVO = "id, name, modifiedTime, md5Checksum"
+
+# Datas no nome do arquivo: 2025-03-01 ou 01-03-2025 / 01.03.2025 / 01_03_2025
+_PADRAO_ISO = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_PADRAO_BR = re.compile(r"(\d{2})[-._](\d{2})[-._](\d{4})")
+
+
+def extrair_data(nome):
+    """
+    Retorna a data contida no nome do arquivo ou None.
+    """
+    encontrado = _PADRAO_ISO.search(nome)
+    try:
+        if encontrado:
+            ano, mes, dia = encontrado.groups()
+            return date(int(ano), int(mes), int(dia))
+        encontrado = _PADRAO_BR.search(nome)
+        if encontrado:
+            dia, mes, ano = encontrado.groups()
+            return date(int(ano), int(mes), int(dia))
+    except ValueError:
+        return None
+    return None
+
+
+class IndicePastas:
+    """
+    Índice persistido em disco das pastas do Drive, atualizado pelo modifiedTime
+    ou, com `vigia` definido, pelo feed de mudanças do Drive.
+    `obter_servico` devolve o cliente do Drive da thread atual.
+    """
+
+    def __init__(self, pasta_cache, obter_servico):
+        self.pasta_cache = pasta_cache
+        self.obter_servico = obter_servico
+        self.vigia = None
+        self._estados = {}
+        self._locks = {}
+        self._lock_geral = threading.Lock()
+        os.makedirs(self.pasta_cache, exist_ok=True)
+
+    def _lock(self, pasta_id):
+        with self._lock_geral:
+            return self._locks.setdefault(pasta_id, threading.Lock())
+
+    def _caminho(self, pasta_id):
+        return os.path.join(self.pasta_cache, f"{pasta_id}.json")
+
+    def _listar(self, consulta):
+        """
+        Percorre todas as páginas da listagem e retorna os arquivos encontrados.
+        """
+        arquivos = []
+        token = None
+        with etapa("listagem") as registro:
+            paginas = 0
+            while True:
+                resultados = self.obter_servico().files().list(
+                    q=consulta,
+                    fields=f"nextPageToken, files({CAMPOS_ARQUIVO})",
+                    pageSize=1000,
+                    pageToken=token
+                ).execute()
+                paginas += 1
+                arquivos.extend(resultados.get('files', []))
+                token = resultados.get('nextPageToken')
+                if not token:
+                    registro.update(paginas=paginas, arquivos=len(arquivos))
+                    return arquivos
+
+    def _carregar_estado(self, pasta_id):
+        estado = self._estados.get(pasta_id)
+        if estado is None:
+            try:
+                with open(self._caminho(pasta_id), encoding="utf-8") as arquivo:
+                    estado = json.load(arquivo)
+            except (OSError, ValueError):
+                estado = None
+        return estado
+
+    def _gravar_estado(self, pasta_id, estado):
+        self._estados[pasta_id] = estado
+        temporario = f"{self._caminho(pasta_id)}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(estado, arquivo)
+        os.replace(temporario, self._caminho(pasta_id))
+
+    def arquivos(self, pasta_id):
+        """
+        Lista atualizada dos CSVs da pasta ({id, name, modifiedTime, md5Checksum}).
+        """
+        consulta = f"'{pasta_id}' in parents and mimeType='text/csv' and trashed=false"
+        # Fora do lock da pasta: o vigia o usa para aplicar as mudanças
+        vigiado = self.vigia is not None and self.vigia.em_dia()
+        with self._lock(pasta_id):
+            estado = self._carregar_estado(pasta_id)
+            if vigiado and estado is not None and estado["listado_em"] >= self.vigia.desde:
+                return list(estado["arquivos"].values())
+            if estado is None or vigiado or time.time() - estado["listado_em"] > VALIDADE_LISTAGEM_COMPLETA:
+                inicio = time.time()
+                listados = self._listar(consulta)
+                estado = {"listado_em": inicio, "arquivos": {arq["id"]: arq for arq in listados}}
+            else:
+                ultima = max((arq["modifiedTime"] for arq in estado["arquivos"].values()), default=None)
+                if ultima is not None:
+                    consulta += f" and modifiedTime > '{ultima}'"
+                for arq in self._listar(consulta):
+                    estado["arquivos"][arq["id"]] = arq
+            self._gravar_estado(pasta_id, estado)
+            return list(estado["arquivos"].values())
+
+    def aplicar_mudancas(self, pasta_id, alterados, removidos):
+        """
+        Atualiza o índice da pasta com as mudanças vindas do feed do Drive. Pastas
+        ainda não listadas ficam como estão (a primeira consulta faz a listagem).
+        """
+        with self._lock(pasta_id):
+            estado = self._carregar_estado(pasta_id)
+            if estado is None:
+                return
+            mudou = False
+            for file_id in removidos:
+                mudou |= estado["arquivos"].pop(file_id, None) is not None
+            for arq in alterados:
+                mudou |= estado["arquivos"].get(arq["id"]) != arq
+                estado["arquivos"][arq["id"]] = arq
+            if mudou:
+                self._gravar_estado(pasta_id, estado)
+
+    def por_data(self, pasta_id):
+        """
+        Mapa {data: arquivo} a partir dos nomes; com mais de um arquivo na mesma
+        data, fica o modificado por último.
+        """
+        mapa = {}
+        for arq in sorted(self.arquivos(pasta_id), key=lambda a: a.get("modifiedTime", "")):
+            data_arquivo = extrair_data(arq["name"])
+            if data_arquivo is not None:
+                mapa[data_arquivo] = arq
+        return mapa
+
+    def no_periodo(self, pasta_id, inicio, fim):
+        """
+        Lista ordenada de (data, arquivo) com as datas entre início e fim, inclusive.
+        """
+        mapa = self.por_data(pasta_id)
+        return sorted((d, arq) for d, arq in mapa.items() if inicio <= d <= fim)
@@ -0,0 +1,71 @@
+import time
+import threading
+
+# ---------------------- LIMITE ADAPTATIVO DE CHAMADAS AO GPT ----------------------
+# As chamadas ao chat completions abertas ao mesmo tempo ficam limitadas a um número
+# de vagas que acompanha os limites da conta: a cada 429 o limite cai pela metade
+# (várias 429 da mesma leva contam como uma só) e volta a subir devagar, uma vaga a
+# cada leva de respostas bem-sucedidas, sem passar do máximo configurado nem da folga
+# informada pela OpenAI nos cabeçalhos x-ratelimit-remaining-requests e
+# x-ratelimit-remaining-tokens.
+# Quem recebe 429 devolve a vaga antes de esperar o Retry-After (ver
+# Pipeline.postar_com_retentativas), deixando-a para as chamadas que já podem seguir.
+
+# Intervalo (segundos) em que novas 429 não reduzem o limite outra vez
+JANELA_REDUCAO = 2
+
+
+def _inteiro(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class LimiteAdaptativo:
+    """
+    Semáforo com número de vagas ajustável entre 1 e `maximo`. `tokens_por_chamada`
+    estima quanto do limite de tokens por minuto cada chamada consome.
+    """
+
+    def __init__(self, maximo, tokens_por_chamada):
+        self.maximo = maximo
+        self.limite = maximo
+        self.tokens_por_chamada = tokens_por_chamada
+        self._em_uso = 0
+        self._reduzido_em = None
+        self._condicao = threading.Condition()
+
+    def adquirir(self):
+        with self._condicao:
+            self._condicao.wait_for(lambda: self._em_uso < int(self.limite))
+            self._em_uso += 1
+
+    def liberar(self):
+        with self._condicao:
+            self._em_uso -= 1
+            self._condicao.notify()
+
+    def observar(self, status, cabecalhos):
+        """
+        Ajusta o limite pela resposta de uma chamada: reduz em 429 e, nas bem-sucedidas,
+        sobe 1/limite vaga (uma vaga por leva) até a folga que a conta ainda tem no minuto.
+        """
+        with self._condicao:
+            if status == 429:
+                agora = time.monotonic()
+                if self._reduzido_em is None or agora - self._reduzido_em >= JANELA_REDUCAO:
+                    self.limite = max(1, int(self.limite) // 2)
+                    self._reduzido_em = agora
+                return
+            if status >= 400:
+                return
+            teto = self.maximo
+            requisicoes = _inteiro(cabecalhos.get("x-ratelimit-remaining-requests"))
+            if requisicoes is not None:
+                teto = min(teto, requisicoes)
+            tokens = _inteiro(cabecalhos.get("x-ratelimit-remaining-tokens"))
+            if tokens is not None:
+                teto = min(teto, tokens // self.tokens_por_chamada)
+            self.limite = max(1, min(self.limite + 1 / self.limite, teto))
+            self._condicao.notify_all()
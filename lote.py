@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import argparse
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from pipeline import OPCOES_ANALISE, Pipeline
+from vigia_drive import INTERVALO_VERIFICACAO
+
+# ---------------------- EXECUTOR EM LOTE ----------------------
+# Pré-calcula as análises programadas (dia, semana e mês até a data) fora do
+# Streamlit, para a interface abrir com os relatórios prontos. Pensado para o cron:
+#
+#   0 6 * * * cd /caminho/do/app && python lote.py
+#
+# Os resultados ficam em .cache/prontos, só o mais recente de cada tipo (ver Pipeline.gravar_pronto).
+#
+# Com --vigiar o processo fica rodando: acompanha o feed de mudanças do Drive e
+# refaz as análises programadas sempre que chegam CSVs novos ou alterados.
+
+CAMINHO_SEGREDOS = os.path.join(".streamlit", "secrets.toml")
+TIPOS_PERIODO = ("diario", "semanal", "mes")
+# Períodos analisados ao mesmo tempo (cada um já baixa as pastas em paralelo)
+MAX_PERIODOS_PARALELOS = 3
+# Só o relatório diário manda o resumo no WhatsApp
+TIPOS_COM_WHATSAPP = ("diario",)
+
+
+def carregar_segredos(caminho=CAMINHO_SEGREDOS):
+    """
+    Lê as mesmas chaves usadas pelo app (st.secrets) do arquivo TOML.
+    """
+    with open(caminho, "rb") as arquivo:
+        return tomllib.load(arquivo)
+
+
+def periodos_programados(referencia, tipos=TIPOS_PERIODO):
+    """
+    Lista de (tipo, data_inicio, data_fim) que terminam na data de referência:
+    o próprio dia, os últimos 7 dias e o mês até a data.
+    """
+    inicios = {
+        "diario": referencia,
+        "semanal": referencia - timedelta(days=6),
+        "mes": referencia.replace(day=1),
+    }
+    return [(tipo, inicios[tipo], referencia) for tipo in tipos]
+
+
+def executar_periodo(pipeline, tipo, data_inicio, data_fim, opcoes_analise, argumentos):
+    """
+    Roda a análise de um período e grava o resultado como análise pronta.
+    Retorna a tupla (tipo, mensagens de erro).
+    """
+    analise = pipeline.executar_analise(
+        data_inicio, data_fim, opcoes_analise,
+        forcar_atualizacao=argumentos.forcar,
+        salvar_no_drive=not argumentos.sem_drive,
+        enviar_whatsapp=not argumentos.sem_whatsapp and tipo in TIPOS_COM_WHATSAPP,
+        mapa_reducao=argumentos.mapa_reducao,
+    )
+    pipeline.gravar_pronto(tipo, analise)
+    erros = [texto for nivel, texto in analise["mensagens_carga"] + analise["mensagens_saida"] if nivel == "error"]
+    return tipo, erros
+
+
+def executar_periodos(pipeline, periodos, opcoes_analise, argumentos):
+    """
+    Analisa os períodos ao mesmo tempo, imprimindo o andamento. Retorna o número de falhas.
+    """
+    falhas = 0
+    with ThreadPoolExecutor(max_workers=max(argumentos.paralelos, 1)) as executor:
+        futuros = [
+            executor.submit(executar_periodo, pipeline, tipo, inicio, fim, opcoes_analise, argumentos)
+            for tipo, inicio, fim in periodos
+        ]
+        for (tipo, inicio, fim), futuro in zip(periodos, futuros):
+            try:
+                _, erros = futuro.result()
+            except Exception as e:
+                falhas += 1
+                print(f"[{datetime.now():%H:%M:%S}] {tipo} {inicio} a {fim}: falhou ({e})", file=sys.stderr)
+                continue
+            print(f"[{datetime.now():%H:%M:%S}] {tipo} {inicio} a {fim}: pronto")
+            for erro in erros:
+                print(f"    {erro}", file=sys.stderr)
+    return falhas
+
+
+def vigiar(pipeline, opcoes_analise, argumentos):
+    """
+    Refaz as análises programadas a cada lote de CSVs novos ou alterados no Drive,
+    até Ctrl+C. O resumo do WhatsApp continua só com a execução do cron.
+    """
+    argumentos = argparse.Namespace(**{**vars(argumentos), "sem_whatsapp": True})
+
+    def recalcular(alteradas):
+        referencia = argumentos.data or date.today() - timedelta(days=1)
+        print(f"[{datetime.now():%H:%M:%S}] mudanças em {len(alteradas)} pasta(s) do Drive")
+        executar_periodos(pipeline, periodos_programados(referencia, argumentos.periodos), opcoes_analise, argumentos)
+
+    pipeline.iniciar_vigia(recalcular, argumentos.intervalo)
+    try:
+        while True:
+            time.sleep(argumentos.intervalo)
+            if pipeline.vigia.ultimo_erro is not None:
+                print(f"[{datetime.now():%H:%M:%S}] vigia: {pipeline.vigia.ultimo_erro}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pipeline.vigia.parar()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-calcula os relatórios programados do Analista Financeiro.")
+    parser.add_argument("--data", type=date.fromisoformat,
+                        help="data de referência AAAA-MM-DD (padrão: ontem)")
+    parser.add_argument("--periodos", nargs="+", choices=TIPOS_PERIODO, default=list(TIPOS_PERIODO))
+    parser.add_argument("--paralelos", type=int, default=MAX_PERIODOS_PARALELOS,
+                        help="quantos períodos analisar ao mesmo tempo")
+    parser.add_argument("--forcar", action="store_true", help="ignora os relatórios memorizados")
+    parser.add_argument("--sem-drive", action="store_true", help="não envia relatório e indicadores ao Drive")
+    parser.add_argument("--sem-whatsapp", action="store_true", help="não envia o resumo diário pelo WhatsApp")
+    parser.add_argument("--mapa-reducao", action="store_true",
+                        help="gera o relatório em fatias paralelas por unidade, convênio e análise")
+    parser.add_argument("--vigiar", action="store_true",
+                        help="fica rodando e refaz as análises quando chegam CSVs novos ao Drive (sem WhatsApp)")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_VERIFICACAO,
+                        help="segundos entre as consultas ao feed de mudanças com --vigiar")
+    parser.add_argument("--segredos", default=CAMINHO_SEGREDOS)
+    argumentos = parser.parse_args(argv)
+
+    pipeline = Pipeline(carregar_segredos(argumentos.segredos))
+    opcoes_analise = [nome for _, nome in OPCOES_ANALISE]
+    if argumentos.vigiar:
+        return vigiar(pipeline, opcoes_analise, argumentos)
+    referencia = argumentos.data or date.today() - timedelta(days=1)
+    falhas = executar_periodos(pipeline, periodos_programados(referencia, argumentos.periodos), opcoes_analise, argumentos)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
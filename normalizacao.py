@@ -0,0 +1,77 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# ---------------------- NORMALIZAÇÃO DAS PLANILHAS ----------------------
+# As duas funções trabalham coluna a coluna sobre os valores distintos de cada
+# coluna (pd.factorize), em vez de montar uma Series por linha. As exportações
+# repetem muito os mesmos textos (unidade, convênio, exame, valores), então o
+# trabalho em Python fica proporcional à quantidade de valores distintos.
+
+# Incrementar quando a normalização mudar, para invalidar o cache local dos CSVs
+VERSAO_NORMALIZACAO = "5"
+
+
+def remover_linhas_total(df):
+    """
+    Remove as linhas em que alguma coluna de texto contenha a palavra "total"
+    (sem diferenciar maiúsculas/minúsculas), como as linhas de resumo das exportações.
+    """
+    linhas_total = np.zeros(len(df), dtype=bool)
+    for posicao in range(df.shape[1]):
+        coluna = df.iloc[:, posicao]
+        if pd.api.types.is_numeric_dtype(coluna) or pd.api.types.is_bool_dtype(coluna):
+            continue
+        codigos, unicos = pd.factorize(coluna)
+        textos = pd.Series(unicos, dtype=object).astype(str).astype("string[pyarrow]")
+        contem_total = np.append(textos.str.lower().str.contains("total", regex=False).to_numpy(dtype=bool), False)
+        # Código -1 (valor ausente) aponta para o False acrescentado no final
+        linhas_total |= contem_total[codigos]
+    return df[~linhas_total]
+
+
+def tratar_valores_numericos(df, colunas):
+    """
+    Converte as colunas especificadas para formato numérico.
+    Garante que os separadores de milhar e decimal sejam tratados corretamente
+    ("1.234,56" -> 1234.56), aceitando sinal negativo e o prefixo "R$".
+    Colunas já numéricas são mantidas; valores que não formam número viram NaN.
+    """
+    for col in colunas:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        codigos, unicos = pd.factorize(df[col])
+        # As substituições rodam no Arrow, sem laço Python por valor
+        textos = pd.Series(unicos, dtype=object).astype(str).astype("string[pyarrow]")
+        textos = textos.str.replace(r"R\$|[.\s]", "", regex=True).str.replace(",", ".", regex=False)
+        numeros = pd.to_numeric(textos, errors='coerce')
+        if pd.api.types.is_integer_dtype(numeros) and not numeros.hasnans and not (codigos < 0).any():
+            valores = numeros.to_numpy(dtype='int64')
+        else:
+            # Código -1 (valor ausente) aponta para o NaN acrescentado no final
+            valores = np.append(numeros.to_numpy(dtype=float, na_value=np.nan), np.nan)
+        df[col] = valores[codigos]
+    return df
+
+
+def sem_acento(texto):
+    """
+    Texto em minúsculas e sem acentos, para comparar nomes de colunas e valores.
+    """
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def localizar_coluna(df, *palavras, excluir=()):
+    """
+    Retorna o nome da primeira coluna que contenha alguma das palavras, ou None.
+    """
+    if df is None:
+        return None
+    for palavra in palavras:
+        for col in df.columns:
+            nome = sem_acento(col)
+            if palavra in nome and not any(e in nome for e in excluir):
+                return col
+    return None
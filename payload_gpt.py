@@ -0,0 +1,181 @@
+import pandas as pd
+
+from normalizacao import localizar_coluna, sem_acento
+
+# ---------------------- PAYLOAD DE DADOS PARA O GPT ----------------------
+# Cada planilha vira um resumo agregado (totais, agrupamentos por unidade,
+# convênio, exame e dia, maiores valores) em vez do despejo linha a linha.
+# O resumo de cada planilha tem níveis de detalhe; enquanto o texto não couber
+# no orçamento de tokens, a planilha de menor prioridade perde um nível.
+
+# Níveis de detalhe: 2 = completo, 1 = reduzido, 0 = só totais, -1 = omitida
+NIVEL_COMPLETO = 2
+MAIORES_POR_NIVEL = {2: 10, 1: 3}
+
+# Prioridade base de cada planilha (maior = mantida por mais tempo)
+PRIORIDADE_PLANILHAS = {
+    "producao_geral": 10,
+    "custo_geral": 9,
+    "producao_conv": 8,
+    "meta_mes": 8,
+    "tributos_ljp": 7,
+    "tributos_lmg": 7,
+    "orcamentos": 6,
+    "exames_conv": 5,
+    "exames_unid": 5,
+    "extratos": 4,
+    "pmr": 4,
+    "marketing": 2,
+    "fidelidade": 1,
+}
+
+# Planilhas relevantes para cada análise marcada na barra lateral
+PLANILHAS_POR_ANALISE = {
+    "Rentabilidade": ["producao_geral", "producao_conv", "custo_geral", "tributos_ljp", "tributos_lmg", "exames_conv", "exames_unid"],
+    "EBITDA": ["producao_geral", "custo_geral", "tributos_ljp", "tributos_lmg"],
+    "Margem": ["producao_geral", "custo_geral", "tributos_ljp", "tributos_lmg"],
+    "Ponto de Equilíbrio": ["producao_geral", "custo_geral", "exames_conv", "exames_unid"],
+    "Ticket Médio": ["producao_conv", "producao_geral"],
+    "Desconto Médio": ["orcamentos"],
+    "Taxa de Conversão": ["orcamentos", "producao_geral"],
+    "Fluxo de Caixa": ["extratos", "pmr"],
+    "Indicadores Financeiros": ["extratos", "pmr"],
+    "Elasticidade": ["orcamentos", "producao_conv"],
+    "Volume e Conversão": ["producao_geral", "producao_conv", "orcamentos", "exames_conv", "exames_unid"],
+    "Marketing": ["marketing", "fidelidade"],
+    "Meta Mensal": ["meta_mes", "producao_geral"],
+}
+BONUS_ANALISE_SELECIONADA = 10
+
+# Dimensões usadas nos agrupamentos, na ordem em que aparecem no resumo
+DIMENSOES = (
+    ("unidade", ("unidade",)),
+    ("convênio", ("conv",)),
+    ("exame", ("exame", "procedimento")),
+    ("dia", ("data",)),
+)
+# Colunas numéricas que são identificadores e não devem ser somadas
+PALAVRAS_IDENTIFICADOR = ("cod", "cpf", "cep", "telefone", "paciente", "id ")
+
+_codificador = None
+
+
+def contar_tokens(texto, modelo="gpt-4"):
+    """
+    Conta os tokens do texto com o tiktoken. Se ele não estiver disponível,
+    usa a estimativa de ~4 caracteres por token.
+    """
+    global _codificador
+    if _codificador is None:
+        try:
+            import tiktoken
+            _codificador = tiktoken.encoding_for_model(modelo)
+        except Exception:
+            _codificador = False
+    if _codificador is False:
+        return len(texto) // 4 + 1
+    return len(_codificador.encode(texto))
+
+
+def _colunas_valor(df):
+    colunas = []
+    for col in df.columns:
+        nome = sem_acento(col) + " "
+        if not pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col]):
+            continue
+        if any(p in nome for p in PALAVRAS_IDENTIFICADOR) and not any(p in nome for p in ("qtd", "quant")):
+            continue
+        colunas.append(col)
+    return colunas
+
+
+def _tabela(df):
+    numericas = df.select_dtypes("number").columns
+    return df.round({col: 2 for col in numericas}).to_csv(index=False, sep=";").strip()
+
+
+def resumir_planilha(df, nivel):
+    """
+    Resumo em texto da planilha no nível de detalhe pedido.
+    Nível 0 traz só linhas e totais; nível 1 acrescenta os maiores grupos por
+    dimensão; nível 2 amplia os grupos e inclui a série diária.
+    """
+    valores = _colunas_valor(df)
+    partes = [f"linhas: {len(df)}"]
+    if valores:
+        totais = df[valores].sum()
+        partes.append("totais: " + "; ".join(f"{col}={totais[col]:.2f}" for col in valores))
+    if nivel <= 0:
+        return "\n".join(partes)
+
+    maiores = MAIORES_POR_NIVEL[nivel]
+    # Planilhas pequenas (tributos, meta, tabelas) cabem inteiras
+    if len(df) <= maiores:
+        partes.append(_tabela(df))
+        return "\n".join(partes)
+    ordenar_por = localizar_coluna(df[valores], "fatur", "valor", "custo", "quant") if valores else None
+    # Dimensões só entre as colunas que não são somadas ("Qtd Exames" não é o exame)
+    dimensoes = df.drop(columns=valores)
+    for nome_dimensao, palavras in DIMENSOES:
+        col = localizar_coluna(dimensoes, *palavras)
+        if col is None or (nome_dimensao == "dia" and nivel < NIVEL_COMPLETO):
+            continue
+        if valores:
+            grupos = df.groupby(col, sort=False)[valores].sum()
+        else:
+            grupos = df.groupby(col, sort=False).size().to_frame("linhas")
+        if nome_dimensao == "dia":
+            grupos = grupos.sort_index()
+        elif ordenar_por is not None:
+            grupos = grupos.sort_values(ordenar_por, ascending=False)
+        omitidos = max(len(grupos) - maiores, 0) if nome_dimensao != "dia" else 0
+        if omitidos:
+            grupos = grupos.head(maiores)
+        titulo = f"por {nome_dimensao}" + (f" (maiores {maiores} de {len(grupos) + omitidos})" if omitidos else "")
+        partes.append(f"{titulo}:\n{_tabela(grupos.reset_index())}")
+    return "\n".join(partes)
+
+
+def prioridades(opcoes_analise):
+    """
+    Prioridade de cada planilha, somando o bônus das análises selecionadas.
+    """
+    resultado = dict(PRIORIDADE_PLANILHAS)
+    for analise in opcoes_analise:
+        for chave in PLANILHAS_POR_ANALISE.get(analise, []):
+            resultado[chave] = resultado.get(chave, 0) + BONUS_ANALISE_SELECIONADA
+    return resultado
+
+
+def montar_payload(dados, opcoes_analise, orcamento_tokens, modelo="gpt-4"):
+    """
+    Monta o texto com os resumos das planilhas dentro do orçamento de tokens.
+    Retorna a tupla (texto, {planilha: nível usado}); planilhas omitidas ficam com -1.
+    """
+    prioridade = prioridades(opcoes_analise)
+    niveis = {chave: NIVEL_COMPLETO for chave in dados}
+    resumos = {}
+    tokens = {}
+
+    def atualizar(chave):
+        if niveis[chave] < 0:
+            resumos[chave], tokens[chave] = "", 0
+            return
+        resumos[chave] = f"### {chave}\n{resumir_planilha(dados[chave], niveis[chave])}"
+        tokens[chave] = contar_tokens(resumos[chave], modelo)
+
+    for chave in dados:
+        atualizar(chave)
+    # Rebaixa um nível por vez, começando pelas planilhas de menor prioridade:
+    # todas passam para o nível reduzido antes de alguma ficar só com totais
+    ordem = sorted(dados, key=lambda chave: prioridade.get(chave, 0))
+    for nivel_alvo in (1, 0, -1):
+        for chave in ordem:
+            if sum(tokens.values()) <= orcamento_tokens:
+                break
+            if niveis[chave] > nivel_alvo:
+                niveis[chave] = nivel_alvo
+                atualizar(chave)
+
+    texto = "\n\n".join(resumos[chave] for chave in sorted(dados, key=lambda c: -prioridade.get(c, 0)) if resumos[chave])
+    return texto, niveis
@@ -0,0 +1,1179 @@
+import os
+import io
+import json
+import itertools
+import random
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+# As bibliotecas do Google Drive (googleapiclient) são importadas no primeiro uso
+from cache_csv import CacheCSV
+from cache_relatorios import CacheRelatorios, impressao_digital
+from historico import HistoricoProducao
+from indice_pastas import IndicePastas
+from indicadores import calcular_indicadores, formatar_percentual, formatar_reais
+from limite_gpt import LimiteAdaptativo
+from esquemas import concatenar_tipados, descrever_divergencias, esquema_da_pasta, ler_csv_tipado, versao_esquema
+from fatias_gpt import TOKENS_RESPOSTA_CONSOLIDACAO, anexar_parciais, montar_consolidacao, montar_fatias
+from normalizacao import VERSAO_NORMALIZACAO
+from payload_gpt import contar_tokens, montar_payload
+from rastreamento import etapa, propagar, rastrear
+from vigia_drive import INTERVALO_VERIFICACAO, VigiaDrive
+
+# ---------------------- PIPELINE DA ANÁLISE ----------------------
+# Etapas da análise (leitura do Drive -> normalização -> indicadores -> GPT ->
+# saídas no Drive e no WhatsApp) sem dependência do Streamlit. A interface
+# (app.py) e o executor em lote (lote.py) rodam as mesmas etapas.
+
+# ---------------------- IDS DAS PASTAS NO GOOGLE DRIVE ----------------------
+pastas_ids = {
+    "tabela_preco_convenios": "1FwE_Qdjv6ERsL3Dt9dUr4xrIbxzYxWkt",
+    "tabela_custos_exames": "1GAoelILXNIMplq_g-jZkd9Gc_ebUFxT3",
+    "producao_diaria_geral": "1yEba6h_GLE2NCFKPwq3U7JpDL503lm1z",
+    "custo_geral": "1G3T4rXWRWBbz1vJrKQji3eM89F9mUbhi",
+    "orcamentos_nao_convertidos": "1ANSQ3AKOsZWmCVm3-T2XclJNMnEkkWKR",
+    "fidelidade": "19UkxnrFSY78PBVyeqyj5hmDtBXNN_OPC",
+    "extratos_bancarios": "1FQV_1uXYy7jfp8LpZ0eRCjfLrRF9r5ba",
+    "saida_gpt": "1prkf5SBpNc09LaE7R3_RY6ipsjkXwWqU",
+    "planilha_mestre_saida": "ID_PLANILHA_MESTRA",  # Substitua pelo ID correto
+    "exames_por_convenio": "1GIPM_lJ08RvBl3OW3YWKG2TaVob_xi0a",
+    "exames_por_unidade": "1G1NjpOLs--NY-43MSAHOFw0FtRxqjhdj",
+    "prazo_medio": "1Fzi9SVkQhUktCdjMCTD3Jmy1n8VWepEs",
+    "estrategia_marketing": "1ipVIwAvtshUzZQp3wwZPCuAxZk862faq",
+    "tributos_ljp": "1LOz99HHvH-VlRernKDuPmxeHEIfxJNFw",
+    "tributos_lmg": "1CW28OATRpL7xK-IZwqOyQ47nRoi1wchK",
+    "producao_diaria_por_convenio": "1ZxqhaYPYrzKq3iVV32TfoxRGKmvEA2Ci",
+    "meta_mes": "1EJseWmWfhpPM0FQgnfQdYgabQ-xNbXPa"
+}
+
+# ---------------------- FONTES DE DADOS DA ANÁLISE ----------------------
+# Cada fonte indica a chave usada em `dados`, a pasta de origem (cujo esquema, em
+# esquemas.py, define os tipos das colunas), se a pasta tem um arquivo por dia
+# (carregado para todo o período selecionado), se a produção é servida pelo
+# histórico local (opcional) e o aviso exibido quando nenhum arquivo é encontrado.
+fontes_dados = [
+    {"chave": "producao_geral", "pasta": "producao_diaria_geral",
+     "por_data": False, "historico": True, "aviso": "Produção diária geral não encontrada."},
+    {"chave": "custo_geral", "pasta": "custo_geral",
+     "por_data": True, "aviso": "Planilha de custo geral não encontrada."},
+    {"chave": "orcamentos", "pasta": "orcamentos_nao_convertidos",
+     "por_data": False, "aviso": "Orçamentos não convertidos não encontrados."},
+    {"chave": "fidelidade", "pasta": "fidelidade",
+     "por_data": False, "aviso": "Planilha de fidelidade não encontrada."},
+    {"chave": "extratos", "pasta": "extratos_bancarios",
+     "por_data": False, "aviso": "Extratos bancários não encontrados."},
+    {"chave": "exames_conv", "pasta": "exames_por_convenio",
+     "por_data": False, "aviso": "Planilha de exames por convênio não encontrada."},
+    {"chave": "exames_unid", "pasta": "exames_por_unidade",
+     "por_data": False, "aviso": "Planilha de exames por unidade não encontrada."},
+    {"chave": "pmr", "pasta": "prazo_medio",
+     "por_data": False, "aviso": "Planilha de prazo médio de recebimento não encontrada."},
+    {"chave": "marketing", "pasta": "estrategia_marketing",
+     "por_data": False, "aviso": "Planilha de estratégia de marketing não encontrada."},
+    {"chave": "tributos_ljp", "pasta": "tributos_ljp",
+     "por_data": False, "aviso": "Planilha de tributos LJP não encontrada."},
+    {"chave": "tributos_lmg", "pasta": "tributos_lmg",
+     "por_data": False, "aviso": "Planilha de tributos LMG não encontrada."},
+    {"chave": "producao_conv", "pasta": "producao_diaria_por_convenio",
+     "por_data": False, "historico": True, "aviso": "Planilha de produção diária por convênio não encontrada."},
+    {"chave": "meta_mes", "pasta": "meta_mes",
+     "por_data": False, "aviso": "Planilha de meta do mês não encontrada."},
+]
+
+# Análises disponíveis: (rótulo na barra lateral, nome enviado ao GPT)
+OPCOES_ANALISE = [
+    ("Rentabilidade (Geral, Unidade, Convênio)", "Rentabilidade"),
+    ("EBITDA", "EBITDA"),
+    ("Margem de Contribuição/Operacional", "Margem"),
+    ("Ponto de Equilíbrio", "Ponto de Equilíbrio"),
+    ("Ticket Médio (Convênio e Particular)", "Ticket Médio"),
+    ("% Médio de Desconto", "Desconto Médio"),
+    ("Taxa Média de Conversão", "Taxa de Conversão"),
+    ("Fluxo de Caixa (Projetado e Real)", "Fluxo de Caixa"),
+    ("Capital de Giro, Ciclo Financeiro e Liquidez", "Indicadores Financeiros"),
+    ("Elasticidade do Preço", "Elasticidade"),
+    ("Indicadores de Volume (Exames, Pacientes, Orçamentos)", "Volume e Conversão"),
+    ("Análise de Marketing", "Marketing"),
+    ("Meta Mensal (Diferença para bater a meta)", "Meta Mensal"),
+]
+
+# Número máximo de pastas listadas/baixadas ao mesmo tempo
+MAX_DOWNLOADS_PARALELOS = 8
+# Tamanho de cada requisição (Range) dos downloads lidos em fluxo
+TAMANHO_TRECHO_DOWNLOAD = 8 * 1024 * 1024
+
+# Cache local dos CSVs já normalizados (limite de tamanho com remoção LRU)
+PASTA_CACHE_CSV = os.path.join(".cache", "csv")
+LIMITE_CACHE_CSV_MB = 500
+# Histórico acumulado das planilhas diárias de produção (Parquet particionado por dia)
+PASTA_HISTORICO = os.path.join(".cache", "historico")
+# Índice paginado das pastas (mapa data -> arquivo), atualizado pelo modifiedTime
+PASTA_CACHE_INDICES = os.path.join(".cache", "indices")
+# Token e pendências do vigia do feed de mudanças do Drive
+PASTA_VIGIA_DRIVE = os.path.join(".cache", "vigia_drive")
+# Relatórios memorizados pela impressão digital das entradas
+PASTA_CACHE_RELATORIOS = os.path.join(".cache", "relatorios")
+# Relatórios parciais do modo em fatias, memorizados pelo hash de cada pedido
+PASTA_CACHE_FATIAS = os.path.join(".cache", "fatias_gpt")
+# Análises pré-calculadas pelo executor em lote, servidas direto pela interface
+PASTA_RELATORIOS_PRONTOS = os.path.join(".cache", "prontos")
+# Rastro de cada execução (uma linha JSON por análise) e perfis do cProfile
+ARQUIVO_RASTROS = os.path.join(".cache", "rastros.jsonl")
+PASTA_PERFIS = os.path.join(".cache", "perfis")
+
+# ---------------------- COMUNICAÇÃO COM GPT ----------------------
+MODELO_GPT = "gpt-4"
+# Endereços das APIs; os segredos opcionais OPENAI_BASE_URL e ZAPI_BASE_URL os
+# substituem (ex.: servidores locais do benchmark em benchmarks/)
+URL_OPENAI = "https://api.openai.com/v1"
+URL_ZAPI = "https://api.z-api.io"
+# Timeouts (segundos) e retentativas das chamadas HTTP externas
+TIMEOUT_CONEXAO = 10
+TIMEOUT_LEITURA = 60
+MAX_TENTATIVAS_HTTP = 4
+ESPERA_INICIAL_HTTP = 1
+ESPERA_MAXIMA_HTTP = 20
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+# Timeout (segundos) de cada operação de rede dos clientes do Drive
+TIMEOUT_DRIVE = 60
+# Início das mensagens de erro inseridas no texto do relatório
+PREFIXO_ERRO_GPT = "Erro na resposta do GPT"
+# Limite de tokens do prompt (instruções + indicadores + dados); o restante da
+# janela de contexto do modelo fica livre para a resposta
+ORCAMENTO_TOKENS_PROMPT = 6000
+# Máximo de chamadas ao chat completions abertas ao mesmo tempo, somando todas as
+# análises da instância (fatias, consolidação e relatórios inteiros). O segredo
+# opcional OPENAI_MAX_CHAMADAS_PARALELAS o ajusta aos limites da conta; abaixo dele
+# o número de vagas se adapta às 429 e aos cabeçalhos x-ratelimit-* (ver limite_gpt.py).
+MAX_CHAMADAS_GPT_PARALELAS = 8
+# Tentativas de cada fatia cuja resposta veio com erro, antes de seguir sem ela
+MAX_TENTATIVAS_FATIA = 2
+
+
+def esperar_antes_de_repetir(tentativa, retry_after=None):
+    """
+    Espera exponencial com jitter antes da próxima tentativa, limitada a
+    ESPERA_MAXIMA_HTTP; o Retry-After do servidor, quando informado, tem precedência.
+    """
+    espera = min(ESPERA_INICIAL_HTTP * 2 ** tentativa, ESPERA_MAXIMA_HTTP)
+    if retry_after is not None:
+        espera = min(float(retry_after), ESPERA_MAXIMA_HTTP)
+    time.sleep(espera + random.uniform(0, espera / 2))
+
+
+def _versao_arquivo(arquivo):
+    return arquivo.get("md5Checksum"), arquivo.get("modifiedTime")
+
+
+def erro_drive_retentavel(erro):
+    """
+    Indica se vale repetir a chamada ao Drive: respostas 429/5xx, timeouts e falhas de conexão.
+    """
+    import httplib2
+    from googleapiclient.errors import HttpError
+    if isinstance(erro, HttpError):
+        return erro.resp.status in STATUS_RETENTAVEIS
+    return isinstance(erro, (OSError, httplib2.HttpLib2Error))
+
+
+def despachar(tarefas):
+    """
+    Executa ao mesmo tempo as funções de `tarefas` ({destino: função sem argumentos}).
+    Os destinos são independentes: a falha de um não interrompe os outros, e o tempo
+    total fica próximo do da chamada mais lenta. Retorna
+    {destino: {"ok", "resultado", "erro", "segundos"}}.
+    """
+    def executar(destino, funcao):
+        inicio = time.perf_counter()
+        try:
+            with etapa("saida", destino=destino):
+                resultado, erro = funcao(), None
+        except Exception as e:
+            resultado, erro = None, str(e)
+        return {"ok": erro is None, "resultado": resultado, "erro": erro,
+                "segundos": round(time.perf_counter() - inicio, 3)}
+
+    if not tarefas:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(tarefas)) as executor:
+        futuros = {destino: executor.submit(propagar(executar), destino, funcao) for destino, funcao in tarefas.items()}
+        return {destino: futuro.result() for destino, futuro in futuros.items()}
+
+
+def cronometrar_primeiro_trecho(pedacos, registro):
+    """
+    Repassa os pedaços do texto anotando no registro da etapa quanto tempo levou o primeiro.
+    """
+    inicio = time.perf_counter()
+    for pedaco in pedacos:
+        registro.setdefault("primeiro_trecho_s", round(time.perf_counter() - inicio, 3))
+        yield pedaco
+
+
+class FluxoDrive(io.RawIOBase):
+    """
+    Conteúdo de um arquivo do Drive como arquivo binário somente leitura, baixado
+    sob demanda em trechos de TAMANHO_TRECHO_DOWNLOAD bytes (requisições com Range).
+    Só um trecho fica em memória por vez; o leitor de CSV consome o fluxo enquanto
+    ele chega, sem acumular o arquivo inteiro.
+    """
+
+    def __init__(self, request):
+        from googleapiclient.http import MediaIoBaseDownload
+        self._trecho = io.BytesIO()
+        self._downloader = MediaIoBaseDownload(self._trecho, request, chunksize=TAMANHO_TRECHO_DOWNLOAD)
+        self._pendente = b""
+        self._posicao = 0
+        self._concluido = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while self._posicao >= len(self._pendente) and not self._concluido:
+            self._trecho.seek(0)
+            self._trecho.truncate()
+            with etapa("download") as registro:
+                _, self._concluido = self._downloader.next_chunk()
+                registro["bytes"] = self._trecho.tell()
+            self._pendente = self._trecho.getvalue()
+            self._posicao = 0
+        quantidade = min(len(destino), len(self._pendente) - self._posicao)
+        destino[:quantidade] = self._pendente[self._posicao:self._posicao + quantidade]
+        self._posicao += quantidade
+        return quantidade
+
+
+def descrever_indicadores(indicadores):
+    """
+    Texto com os indicadores calculados localmente, para o GPT usar na narrativa sem recalcular.
+    """
+    partes = [json.dumps(indicadores["consolidados"], ensure_ascii=False, default=float)]
+    for chave, titulo in (("por_unidade", "Rentabilidade por unidade"), ("por_convenio", "Rentabilidade por convênio")):
+        tabela = indicadores.get(chave)
+        if tabela is not None and not tabela.empty:
+            partes.append(f"{titulo}:\n{tabela.round(4).to_csv(index=False, sep=';')}")
+    return "\n\n".join(partes)
+
+
+def montar_mensagens_gpt(dados, periodo, opcoes_analise, indicadores=None):
+    """
+    Monta as mensagens do chat com um prompt estruturado para análise estratégica.
+    `dados` mapeia cada planilha para o seu DataFrame; o prompt leva resumos agregados
+    das planilhas dentro de ORCAMENTO_TOKENS_PROMPT. Quando `indicadores` é informado,
+    os números calculados localmente seguem no prompt e o GPT fica responsável apenas
+    pela interpretação.
+    """
+    prompt = (
+        f"Você é o CFO do Laboratório João Paulo. Os dados a seguir referem-se ao período de {periodo['inicio']} a {periodo['fim']}.\n"
+        f"Considere as seguintes regras e indicadores:\n"
+        f"- Rentabilidade geral, por unidade e por convênio (tanto teórica quanto real).\n"
+        f"- EBITDA, margem de contribuição, margem operacional e DRE.\n"
+        f"- Ponto de equilíbrio real, calculado com base na média ponderada do preço de venda por exame, "
+        f"para determinar quantos exames são necessários para cobrir os custos fixos.\n"
+        f"- Ticket médio para convênios e particulares, % médio de desconto e taxa média de conversão.\n"
+        f"- Fluxo de caixa projetado, real, necessidade de capital de giro, ciclo financeiro e índice de liquidez.\n"
+        f"- Elasticidade do preço, analisando o impacto de variações de desconto na conversão e receita.\n"
+        f"- Indicadores de volume: número de exames, número de pacientes, número de orçamentos gerados e perda financeira acumulada.\n"
+        f"- Análise dos dados de marketing para gerar insights estratégicos (ROI, projeções de aumento de receita) – esses dados são complementares.\n"
+        f"- Considerar as diferenças tributárias: LJP (Lucro Presumido) e LMG (Simples Nacional), onde os tributos incidem sobre o preço faturado.\n"
+        f"- Caso especial da Unidade Domiciliar VIP: incluir 10% de comissão médica e R$60 por paciente para coleta.\n\n"
+        f"Os dados recebidos estão organizados em diferentes planilhas (produção, custos, exames por convênio e unidade, prazo médio, "
+        f"marketing, tributos, meta mensal, etc.).\n"
+        f"Análises solicitadas: {', '.join(opcoes_analise)}.\n\n"
+        f"Apresente um relatório estratégico com insights e projeções, explicando quais unidades ou convênios estão lucrativos ou não, "
+        f"o que pode ser ajustado e as oportunidades de melhoria."
+    )
+    if indicadores is not None:
+        prompt += (
+            f"\n\nIndicadores já calculados a partir das planilhas (use estes números, não os recalcule; "
+            f"valores nulos não puderam ser calculados com os dados disponíveis):\n"
+            f"{descrever_indicadores(indicadores)}"
+        )
+    orcamento_dados = max(ORCAMENTO_TOKENS_PROMPT - contar_tokens(prompt, MODELO_GPT), 0)
+    resumo_dados, _ = montar_payload(dados, opcoes_analise, orcamento_dados, MODELO_GPT)
+    if resumo_dados:
+        prompt += f"\n\nResumo dos dados por planilha (valores agregados, separador ';'):\n{resumo_dados}"
+    mensagens = [
+        {"role": "system", "content": "Você é um consultor financeiro e estratégico para o Laboratório João Paulo."},
+        {"role": "user", "content": prompt}
+    ]
+    return mensagens
+
+
+def montar_resumo_whatsapp(periodo, consolidados):
+    """
+    Resumo curto dos indicadores do período para o WhatsApp.
+    """
+    return (
+        f"📊 Relatório Financeiro LJP\n\n"
+        f"Período: {periodo['inicio']} a {periodo['fim']}\n"
+        f"Receita Bruta: {formatar_reais(consolidados['Receita_Bruta'])}\n"
+        f"Rentabilidade Geral: {formatar_percentual(consolidados['Rentabilidade_Geral'])}\n"
+        f"EBITDA: {formatar_reais(consolidados['EBITDA'])}\n"
+        f"Margem de Contribuição: {formatar_percentual(consolidados['Margem_Contribuicao'])}\n"
+        f"Fluxo de Caixa Real: {formatar_reais(consolidados['FluxoCaixa_Real'])}\n"
+        f"Meta: Faltam {formatar_reais(consolidados['FaltanteMeta'])} para bater a meta\n\n"
+        f"Verifique o relatório completo no Drive."
+    )
+
+
+def indicadores_para_json(indicadores):
+    """
+    Versão serializável dos indicadores (tabelas como listas de registros).
+    """
+    resultado = {"consolidados": json.loads(json.dumps(indicadores["consolidados"], default=float))}
+    for chave in ("por_unidade", "por_convenio"):
+        tabela = indicadores.get(chave)
+        resultado[chave] = None if tabela is None else json.loads(tabela.to_json(orient="records"))
+    return resultado
+
+
+def indicadores_de_json(registro):
+    """
+    Inverso de indicadores_para_json.
+    """
+    resultado = {"consolidados": registro["consolidados"]}
+    for chave in ("por_unidade", "por_convenio"):
+        linhas = registro.get(chave)
+        resultado[chave] = None if linhas is None else pd.DataFrame(linhas)
+    return resultado
+
+
+class Pipeline:
+    """
+    Clientes, caches e etapas da análise. `segredos` é o st.secrets do app ou o
+    conteúdo de .streamlit/secrets.toml (executor em lote). Seguro para rodar
+    várias análises ao mesmo tempo em threads diferentes.
+    """
+
+    def __init__(self, segredos):
+        self.openai_key = segredos["OPENAI_API_KEY"]
+        self.zapi_user = segredos["ZAPI_USER"]
+        self.zapi_token = segredos["ZAPI_TOKEN"]
+        self.zapi_client_token = segredos["ZAPI_CLIENT_TOKEN"]
+        self.zapi_phone = segredos["ZAPI_PHONE"]
+        self.url_openai = segredos.get("OPENAI_BASE_URL", URL_OPENAI)
+        self.url_zapi = segredos.get("ZAPI_BASE_URL", URL_ZAPI)
+        # Unidades faturadas pela LMG quando a produção não traz a coluna de empresa
+        self.unidades_lmg = tuple(segredos.get("UNIDADES_LMG", ()))
+        self._info_conta_servico = dict(segredos["gcp_service_account"])
+        self._credenciais = None
+        self._lock_credenciais = threading.Lock()
+        # Um cliente do Drive por thread (ver obter_drive_service)
+        self._drive_local = threading.local()
+        # Uma sincronização do histórico por fonte de cada vez
+        self._locks_historico = {fonte["chave"]: threading.Lock() for fonte in fontes_dados if fonte.get("historico")}
+        # Arquivos que o histórico não conseguiu ingerir: {fonte: {file_id: {"arquivo", "erro"}}}
+        self._falhas_historico = {chave: {} for chave in self._locks_historico}
+        # Última listagem da pasta de cada fonte com histórico (ver sincronizar_historico)
+        self._arquivos_historico = {chave: [] for chave in self._locks_historico}
+
+        self.cache_csv = CacheCSV(PASTA_CACHE_CSV, LIMITE_CACHE_CSV_MB * 1024 * 1024)
+        self.historico = HistoricoProducao(PASTA_HISTORICO)
+        self.indice_pastas = IndicePastas(PASTA_CACHE_INDICES, self.obter_drive_service)
+        # Só as pastas lidas pela análise; as de saída recebem os próprios relatórios
+        self.vigia = VigiaDrive(PASTA_VIGIA_DRIVE, self.obter_drive_service, self.indice_pastas,
+                                {pastas_ids[fonte["pasta"]] for fonte in fontes_dados})
+        self.indice_pastas.vigia = self.vigia
+        self.cache_relatorios = CacheRelatorios(PASTA_CACHE_RELATORIOS)
+        self.cache_fatias = CacheRelatorios(PASTA_CACHE_FATIAS)
+        self._limite_gpt = LimiteAdaptativo(
+            int(segredos.get("OPENAI_MAX_CHAMADAS_PARALELAS", MAX_CHAMADAS_GPT_PARALELAS)),
+            ORCAMENTO_TOKENS_PROMPT
+        )
+        self.relatorios_prontos = CacheRelatorios(PASTA_RELATORIOS_PRONTOS)
+
+        # Sessão HTTP compartilhada, mantendo as conexões keep-alive abertas (pool)
+        # para a OpenAI e demais APIs
+        self.sessao_http = requests.Session()
+        self.sessao_http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=MAX_DOWNLOADS_PARALELOS))
+
+    # ---------------------- GOOGLE DRIVE ----------------------
+    def credenciais(self):
+        """
+        Credenciais da conta de serviço do Google Cloud, criadas no primeiro uso.
+        """
+        with self._lock_credenciais:
+            if self._credenciais is None:
+                from google.oauth2 import service_account
+                self._credenciais = service_account.Credentials.from_service_account_info(
+                    self._info_conta_servico,
+                    scopes=["https://www.googleapis.com/auth/drive"]
+                )
+            return self._credenciais
+
+    def obter_drive_service(self):
+        """
+        Retorna um cliente do Drive exclusivo da thread atual.
+        O transporte httplib2 usado pelo googleapiclient não é thread-safe, então cada
+        thread do carregamento paralelo precisa do seu próprio cliente. O documento de
+        descoberta da API é o que acompanha a biblioteca (sem requisição de rede), e
+        cada operação de rede tem o limite de TIMEOUT_DRIVE segundos.
+        """
+        if not hasattr(self._drive_local, "service"):
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+            from googleapiclient.discovery import build
+            http = AuthorizedHttp(self.credenciais(), http=httplib2.Http(timeout=TIMEOUT_DRIVE))
+            self._drive_local.service = build("drive", "v3", http=http,
+                                              static_discovery=True, cache_discovery=False)
+        return self._drive_local.service
+
+    # ---------------------- LEITURA DOS ARQUIVOS ----------------------
+    def baixar_csv(self, file_id, esquema):
+        """
+        Lê o arquivo do Drive em fluxo e retorna o DataFrame tipado pelo esquema, sem
+        as linhas de "total" e com as divergências em df.attrs["divergencias"]
+        (ver esquemas.ler_csv_tipado). Erros de leitura são propagados para quem chamou.
+        """
+        request = self.obter_drive_service().files().get_media(fileId=file_id)
+        with io.BufferedReader(FluxoDrive(request)) as fluxo:
+            return ler_csv_tipado(fluxo, esquema)
+
+    def ler_csv_do_drive(self, arquivo, esquema):
+        """
+        Retorna o DataFrame já tipado do arquivo do Drive e se ele veio do cache local.
+        A versão em cache é identificada pelo modifiedTime/md5Checksum do arquivo, pelo
+        esquema da pasta e pela versão da normalização. As divergências em relação ao
+        esquema ficam gravadas com o DataFrame (df.attrs).
+        """
+        versao = "|".join([
+            arquivo.get('modifiedTime', ''),
+            arquivo.get('md5Checksum', ''),
+            versao_esquema(esquema),
+            VERSAO_NORMALIZACAO
+        ])
+        with etapa("cache_csv") as registro:
+            df = self.cache_csv.obter(arquivo['id'], versao)
+            registro["cache"] = df is not None
+        if df is not None:
+            return df, True
+        df = self.baixar_csv(arquivo['id'], esquema)
+        self.cache_csv.gravar(arquivo['id'], versao, df)
+        return df, False
+
+    def buscar_csv_mais_recente(self, pasta_id, esquema):
+        """
+        Busca o arquivo CSV mais recente na pasta especificada.
+        Retorna a tupla (DataFrame tipado, veio do cache, metadados do arquivo)
+        ou (None, False, None) se a pasta estiver vazia.
+        Nota: Para arquivos que englobam períodos maiores, o período é informado manualmente.
+        """
+        # Pelo índice da pasta, que com o vigia em dia não faz nenhuma chamada ao Drive
+        arquivos = self.indice_pastas.arquivos(pasta_id)
+        if not arquivos:
+            return None, False, None
+        arquivo = max(arquivos, key=lambda arq: arq.get("modifiedTime", ""))
+        df, do_cache = self.ler_csv_do_drive(arquivo, esquema)
+        return df, do_cache, arquivo
+
+    def buscar_planilhas_no_periodo(self, pasta_id, data_inicio, data_fim, esquema):
+        """
+        Carrega ao mesmo tempo todos os arquivos diários da pasta entre data_inicio e data_fim
+        e os concatena em um único DataFrame, com a data de cada arquivo na coluna "data_arquivo"
+        e as divergências de cada um em df.attrs["divergencias_por_arquivo"].
+        Retorna a tupla (DataFrame ou None, quantidade vinda do cache, lista de metadados).
+        """
+        encontrados = self.indice_pastas.no_periodo(pasta_id, data_inicio, data_fim)
+        if not encontrados:
+            return None, 0, []
+        with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS_PARALELOS) as executor:
+            lidos = list(executor.map(propagar(lambda item: self.ler_csv_do_drive(item[1], esquema)), encontrados))
+        partes = [df.assign(data_arquivo=data_arq.isoformat()) for (data_arq, _), (df, _) in zip(encontrados, lidos)]
+        acertos = sum(1 for _, do_cache in lidos if do_cache)
+        df = concatenar_tipados(partes)
+        df.attrs["divergencias_por_arquivo"] = [(arq["name"], parte.attrs.get("divergencias", []))
+                                                for (_, arq), parte in zip(encontrados, partes)]
+        return df, acertos, [arq for _, arq in encontrados]
+
+    def sincronizar_historico(self, fonte):
+        """
+        Ingere no histórico local os arquivos da pasta ainda não vistos (ou alterados)
+        e retorna a lista atual de arquivos da pasta e a dos arquivos ingeridos agora.
+        Os downloads correm em paralelo, mas a ingestão segue a ordem de modificação,
+        para que a reexportação mais recente de um dia prevaleça. Um arquivo que não
+        pode ser lido não impede os demais: fica em falhas_historico e só é baixado
+        de novo quando mudar no Drive.
+        """
+        with self._locks_historico[fonte["chave"]]:
+            arquivos = self.indice_pastas.arquivos(pastas_ids[fonte["pasta"]])
+            self._arquivos_historico[fonte["chave"]] = arquivos
+            pendentes = self.historico.arquivos_pendentes(fonte["chave"], arquivos)
+            falhas = self._falhas_historico[fonte["chave"]]
+            atuais = {arq["id"]: arq for arq in arquivos}
+            for file_id in [file_id for file_id in falhas if file_id not in atuais]:
+                del falhas[file_id]
+            pendentes = [arq for arq in pendentes
+                         if arq["id"] not in falhas or _versao_arquivo(falhas[arq["id"]]["arquivo"]) != _versao_arquivo(arq)]
+            ingeridos = []
+            # Sem passar pelo cache de CSVs: o histórico já guarda as linhas tipadas
+            esquema = esquema_da_pasta(fonte["pasta"])
+            with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS_PARALELOS) as executor:
+                futuros = [executor.submit(propagar(self.baixar_csv), arq['id'], esquema) for arq in pendentes]
+                for arquivo, futuro in zip(pendentes, futuros):
+                    try:
+                        df = futuro.result()
+                        with etapa("historico_ingestao", linhas=len(df)):
+                            self.historico.ingerir(fonte["chave"], arquivo, df)
+                    except Exception as e:
+                        falhas[arquivo["id"]] = {"arquivo": arquivo, "erro": f"{type(e).__name__}: {e}"}
+                        continue
+                    falhas.pop(arquivo["id"], None)
+                    ingeridos.append(arquivo)
+        return arquivos, ingeridos
+
+    def falhas_historico(self, fonte):
+        """
+        Arquivos da fonte que o histórico não conseguiu ingerir: lista de (nome do arquivo, erro).
+        """
+        with self._locks_historico[fonte["chave"]]:
+            return [(falha["arquivo"].get("name"), falha["erro"]) for falha in self._falhas_historico[fonte["chave"]].values()]
+
+    def buscar_no_historico(self, fonte, data_inicio, data_fim):
+        """
+        Sincroniza o histórico da fonte e retorna a tupla (linhas do período ou None,
+        quantidade de arquivos do período que já estavam no histórico, metadados desses arquivos).
+        As divergências desses arquivos ficam em df.attrs["divergencias_por_arquivo"].
+        """
+        arquivos, ingeridos = self.sincronizar_historico(fonte)
+        with etapa("historico_consulta") as registro:
+            df = self.historico.consultar(fonte["chave"], data_inicio, data_fim)
+            registro["linhas"] = 0 if df is None else len(df)
+        if df is None or df.empty:
+            return None, 0, []
+        usados = self.historico.arquivos_no_periodo(fonte["chave"], arquivos, data_inicio, data_fim)
+        novos = {arq["id"] for arq in ingeridos}
+        df.attrs["divergencias_por_arquivo"] = self.historico.divergencias(fonte["chave"], usados)
+        return df, sum(1 for arq in usados if arq["id"] not in novos), usados
+
+    def producao_do_mes(self, data_inicio, data_fim, dados):
+        """
+        Produção geral do dia 1 do mês de `data_fim` até `data_fim` e os arquivos de onde
+        ela veio. Se o período começa no dia 1, são as linhas já carregadas (sem arquivos
+        extras); senão, vêm do histórico, já sincronizado pela carga das fontes.
+        """
+        inicio_mes = data_fim.replace(day=1)
+        if data_inicio == inicio_mes:
+            return dados.get("producao_geral"), []
+        fonte = next(fonte for fonte in fontes_dados if fonte["chave"] == "producao_geral")
+        with etapa("historico_consulta") as registro:
+            df = self.historico.consultar(fonte["chave"], inicio_mes, data_fim)
+            registro["linhas"] = 0 if df is None else len(df)
+        if df is None or df.empty:
+            return None, []
+        arquivos = self._arquivos_historico[fonte["chave"]]
+        return df, self.historico.arquivos_no_periodo(fonte["chave"], arquivos, inicio_mes, data_fim)
+
+    def carregar_fonte(self, fonte, data_inicio, data_fim):
+        """
+        Carrega uma fonte de dados e retorna {"df", "erro", "arquivos", "acertos_cache",
+        "divergencias", "falhas"}, com None no DataFrame quando não há arquivo e em "erro" quando a
+        leitura funcionou; "divergencias" é a lista de (nome do arquivo, divergências com o esquema)
+        e "falhas", a de (nome do arquivo, erro) dos arquivos que o histórico não ingeriu.
+        Não chama o Streamlit, pois roda fora da thread principal.
+        """
+        pasta_id = pastas_ids[fonte["pasta"]]
+        esquema = esquema_da_pasta(fonte["pasta"])
+        try:
+            with etapa("fonte", fonte=fonte["chave"]) as registro:
+                if fonte.get("historico"):
+                    df, acertos, arquivos = self.buscar_no_historico(fonte, data_inicio, data_fim)
+                elif fonte["por_data"]:
+                    df, acertos, arquivos = self.buscar_planilhas_no_periodo(pasta_id, data_inicio, data_fim, esquema)
+                else:
+                    df, do_cache, arquivo = self.buscar_csv_mais_recente(pasta_id, esquema)
+                    acertos, arquivos = int(do_cache), [arquivo] if arquivo else []
+                    if df is not None:
+                        df.attrs["divergencias_por_arquivo"] = [(arquivo["name"], df.attrs.get("divergencias", []))]
+                registro["linhas"] = 0 if df is None else len(df)
+            divergencias = [] if df is None else df.attrs.get("divergencias_por_arquivo", [])
+            falhas = self.falhas_historico(fonte) if fonte.get("historico") else []
+            return {"df": df, "erro": None, "arquivos": arquivos, "acertos_cache": acertos,
+                    "divergencias": divergencias, "falhas": falhas}
+        except Exception as e:
+            return {"df": None, "erro": e, "arquivos": [], "acertos_cache": 0, "divergencias": [], "falhas": []}
+
+    def carregar_fontes_em_paralelo(self, fontes, data_inicio, data_fim):
+        """
+        Lista e baixa todas as fontes ao mesmo tempo em um pool de threads limitado.
+        Retorna um dicionário {chave: resultado de carregar_fonte}; os avisos de
+        cada pasta ficam a cargo de quem chamou.
+        """
+        with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS_PARALELOS) as executor:
+            futuros = {fonte["chave"]: executor.submit(propagar(self.carregar_fonte), fonte, data_inicio, data_fim) for fonte in fontes}
+            return {chave: futuro.result() for chave, futuro in futuros.items()}
+
+    def pre_carregar(self, alteradas):
+        """
+        Lê para os caches locais os CSVs novos ou alterados que o vigia encontrou
+        ({pasta_id: [arquivos]}): o histórico ingere os diários de produção e o cache
+        de CSVs recebe os demais (nas pastas de arquivo único, só o mais recente).
+        Tenta todos e propaga a primeira falha, para o vigia entregá-los de novo.
+        """
+        fontes_por_pasta = {pastas_ids[fonte["pasta"]]: fonte for fonte in fontes_dados}
+        tarefas = []
+        for pasta_id, arquivos in alteradas.items():
+            fonte = fontes_por_pasta.get(pasta_id)
+            if fonte is None:
+                continue
+            if fonte.get("historico"):
+                tarefas.append(lambda fonte=fonte: self.sincronizar_historico(fonte))
+                continue
+            esquema = esquema_da_pasta(fonte["pasta"])
+            if not fonte["por_data"]:
+                recente = max(self.indice_pastas.arquivos(pasta_id), key=lambda arq: arq.get("modifiedTime", ""), default=None)
+                arquivos = [arq for arq in arquivos if recente is not None and arq["id"] == recente["id"]]
+            tarefas.extend(lambda arq=arq, esquema=esquema: self.ler_csv_do_drive(arq, esquema) for arq in arquivos)
+        with rastrear(f"pre-carga {len(alteradas)} pasta(s)", ARQUIVO_RASTROS):
+            with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS_PARALELOS) as executor:
+                futuros = [executor.submit(propagar(tarefa)) for tarefa in tarefas]
+            for futuro in futuros:
+                futuro.result()
+
+    def iniciar_vigia(self, recalcular=None, intervalo=INTERVALO_VERIFICACAO):
+        """
+        Passa a acompanhar o feed de mudanças do Drive em segundo plano: os CSVs novos
+        ou alterados são pré-carregados assim que aparecem e, com `recalcular`, ele é
+        chamado em seguida com as mesmas pastas ({pasta_id: [arquivos]}) para refazer
+        relatórios e indicadores. Enquanto o vigia estiver em dia, as execuções não
+        listam nenhuma pasta.
+        """
+        def ao_alterar(alteradas):
+            self.pre_carregar(alteradas)
+            if recalcular is not None:
+                recalcular(alteradas)
+
+        self.vigia.ao_alterar = ao_alterar
+        self.vigia.iniciar(intervalo)
+
+    # ---------------------- GPT ----------------------
+    def postar_com_retentativas(self, url, idempotente=True, limite=None, **kwargs):
+        """
+        Faz o POST pela sessão HTTP compartilhada com timeouts de conexão/leitura.
+        Falhas de conexão, timeouts e respostas 429/5xx são repetidas com espera
+        exponencial (respeitando o Retry-After); a última resposta ou exceção é devolvida.
+        Com `idempotente=False` o timeout de leitura não é repetido, pois o servidor
+        pode já ter processado o pedido.
+        Com `limite` (LimiteAdaptativo), cada tentativa ocupa uma vaga, devolvida durante
+        a espera; a resposta retornada continua com a vaga, que o chamador libera.
+        """
+        for tentativa in range(MAX_TENTATIVAS_HTTP):
+            ultima = tentativa == MAX_TENTATIVAS_HTTP - 1
+            retry_after = None
+            if limite is not None:
+                limite.adquirir()
+            try:
+                try:
+                    resposta = self.sessao_http.post(url, timeout=(TIMEOUT_CONEXAO, TIMEOUT_LEITURA), **kwargs)
+                except BaseException:
+                    if limite is not None:
+                        limite.liberar()
+                    raise
+            except requests.ReadTimeout:
+                if ultima or not idempotente:
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                if ultima:
+                    raise
+            else:
+                if limite is not None:
+                    limite.observar(resposta.status_code, resposta.headers)
+                if resposta.status_code not in STATUS_RETENTAVEIS or ultima:
+                    return resposta
+                if resposta.headers.get("Retry-After", "").isdigit():
+                    retry_after = resposta.headers["Retry-After"]
+                resposta.close()
+                if limite is not None:
+                    limite.liberar()
+            esperar_antes_de_repetir(tentativa, retry_after)
+
+    def transmitir_gpt(self, mensagens, max_tokens=None):
+        """
+        Chama o chat completions com stream=True e devolve o texto em pedaços à medida
+        que o modelo gera. Erros viram uma mensagem de erro no próprio texto do relatório.
+        A chamada ocupa uma das vagas do limite adaptativo até terminar.
+        """
+        payload = {
+            "model": MODELO_GPT,
+            "messages": mensagens,
+            "stream": True
+        }
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        try:
+            resposta = self.postar_com_retentativas(
+                f"{self.url_openai}/chat/completions",
+                limite=self._limite_gpt,
+                headers={"Authorization": f"Bearer {self.openai_key}"},
+                json=payload,
+                stream=True
+            )
+        except Exception as e:
+            yield f"{PREFIXO_ERRO_GPT}: {e}"
+            return
+        try:
+            with resposta:
+                if resposta.status_code != 200:
+                    yield f"{PREFIXO_ERRO_GPT}: HTTP {resposta.status_code} - {resposta.text[:500]}"
+                    return
+                try:
+                    # Eventos server-sent: "data: {json}" por linha, terminando com "data: [DONE]"
+                    # chunk_size=None entrega cada pedaço assim que chega, sem esperar encher um buffer
+                    for linha in resposta.iter_lines(chunk_size=None):
+                        linha = linha.decode('utf-8')
+                        if not linha.startswith("data: "):
+                            continue
+                        evento = linha[len("data: "):]
+                        if evento == "[DONE]":
+                            break
+                        escolhas = json.loads(evento).get("choices") or [{}]
+                        trecho = escolhas[0].get("delta", {}).get("content")
+                        if trecho:
+                            yield trecho
+                except Exception as e:
+                    yield f"\n\n{PREFIXO_ERRO_GPT}: {e}"
+        finally:
+            self._limite_gpt.liberar()
+
+    def gerar_fatia(self, fatia, forcar_atualizacao=False):
+        """
+        Relatório parcial de uma fatia: o memorizado com a mesma impressão ou um novo,
+        pedido até MAX_TENTATIVAS_FATIA vezes enquanto a resposta vier com erro.
+        Retorna {"chave", "titulo", "texto", "cache", "erro"}.
+        """
+        parcial = {"chave": fatia["chave"], "titulo": fatia["titulo"], "cache": False, "erro": False}
+        tokens_enviados = sum(contar_tokens(m["content"], MODELO_GPT) for m in fatia["mensagens"])
+        with etapa("gpt_fatia", fatia=fatia["chave"]) as registro:
+            memorizado = None if forcar_atualizacao else self.cache_fatias.obter(fatia["impressao"])
+            if memorizado is not None:
+                registro["cache"] = parcial["cache"] = True
+                parcial["texto"] = memorizado["relatorio"]
+                return parcial
+            registro["tokens_enviados"] = 0
+            for tentativa in range(MAX_TENTATIVAS_FATIA):
+                if tentativa:
+                    esperar_antes_de_repetir(tentativa - 1)
+                registro["tokens_enviados"] += tokens_enviados
+                texto = "".join(self.transmitir_gpt(fatia["mensagens"], fatia["max_tokens"]))
+                if PREFIXO_ERRO_GPT not in texto:
+                    break
+            registro["tokens_recebidos"] = contar_tokens(texto, MODELO_GPT)
+            parcial["texto"] = texto
+            parcial["erro"] = PREFIXO_ERRO_GPT in texto
+            if not parcial["erro"]:
+                self.cache_fatias.gravar(fatia["impressao"], relatorio=texto, fatia=fatia["chave"])
+        return parcial
+
+    def gerar_fatias(self, dados, periodo, opcoes_analise, indicadores, forcar_atualizacao=False):
+        """
+        Fase de mapa do relatório em fatias: uma fatia por unidade, por convênio e por
+        análise marcada (fatias_gpt.montar_fatias), todas pedidas ao mesmo tempo e
+        limitadas pelas vagas do limite adaptativo (limite_gpt.py). Retorna os relatórios
+        parciais (ver gerar_fatia) na ordem das fatias.
+        """
+        with etapa("montagem_fatias") as registro:
+            fatias = montar_fatias(dados, periodo, opcoes_analise, indicadores, MODELO_GPT)
+            registro["fatias"] = len(fatias)
+        if not fatias:
+            return []
+        with ThreadPoolExecutor(max_workers=len(fatias)) as executor:
+            return list(executor.map(propagar(lambda fatia: self.gerar_fatia(fatia, forcar_atualizacao)), fatias))
+
+    # ---------------------- CACHE DE RELATÓRIOS ----------------------
+    def buscar_no_drive_por_impressao(self, pasta_id, chave, propriedade="impressao_digital"):
+        """
+        Procura na pasta um arquivo enviado com a mesma impressão digital (ou outra
+        propriedade de appProperties). Retorna o id do arquivo ou None.
+        """
+        resultados = self.obter_drive_service().files().list(
+            q=(f"'{pasta_id}' in parents and trashed=false and "
+               f"appProperties has {{ key='{propriedade}' and value='{chave}' }}"),
+            fields='files(id)',
+            pageSize=1
+        ).execute()
+        arquivos = resultados.get('files', [])
+        return arquivos[0]['id'] if arquivos else None
+
+    def obter_relatorio_memorizado(self, chave):
+        """
+        Retorna o registro do relatório com a impressão digital informada, procurando
+        primeiro no cache local e depois na pasta saida_gpt do Drive (relatórios gerados
+        por outra instância do app). Retorna None se o relatório ainda não existe ou se
+        o arquivo do Drive contém um erro do GPT.
+        """
+        registro = self.cache_relatorios.obter(chave)
+        if registro is not None and "relatorio" in registro:
+            return registro
+        try:
+            file_id = self.buscar_no_drive_por_impressao(pastas_ids['saida_gpt'], chave)
+            if file_id is None:
+                return None
+            conteudo = self.obter_drive_service().files().get_media(fileId=file_id).execute().decode('utf-8')
+            indicadores_id = self.buscar_no_drive_por_impressao(pastas_ids['planilha_mestre_saida'], chave)
+        except Exception:
+            return None
+        # Texto de erro enviado por versões anteriores não vale como relatório
+        if PREFIXO_ERRO_GPT in conteudo:
+            return None
+        return self.cache_relatorios.gravar(
+            chave,
+            relatorio=conteudo,
+            relatorio_drive_id=file_id,
+            indicadores_drive_id=indicadores_id
+        )
+
+    # ---------------------- SAÍDAS (DRIVE E WHATSAPP) ----------------------
+    def criar_no_drive(self, pasta_id, nome_arquivo, conteudo, mimetype, chave, geracao=None):
+        """
+        Cria o arquivo na pasta com a impressão digital nas appProperties e retorna o id.
+        A chave de idempotência é a geração do conteúdo, quando informada, ou a impressão
+        digital: antes de cada nova tentativa o arquivo é procurado por ela, e se a
+        tentativa anterior chegou ao Drive apesar do erro (timeout na resposta, por
+        exemplo) o arquivo existente é devolvido.
+        """
+        from googleapiclient.http import MediaIoBaseUpload
+        propriedades = {"impressao_digital": chave}
+        if geracao is not None:
+            propriedades["geracao"] = geracao
+        for tentativa in range(MAX_TENTATIVAS_HTTP):
+            try:
+                with etapa("upload_drive", bytes=len(conteudo), tentativa=tentativa + 1):
+                    if tentativa:
+                        if geracao is not None:
+                            existente = self.buscar_no_drive_por_impressao(pasta_id, geracao, "geracao")
+                        else:
+                            existente = self.buscar_no_drive_por_impressao(pasta_id, chave)
+                        if existente is not None:
+                            return existente
+                    media_upload = MediaIoBaseUpload(io.BytesIO(conteudo), mimetype=mimetype)
+                    arquivo = self.obter_drive_service().files().create(
+                        body={"name": nome_arquivo, "parents": [pasta_id], "appProperties": propriedades},
+                        media_body=media_upload,
+                        fields="id"
+                    ).execute()
+                    return arquivo["id"]
+            except Exception as e:
+                if tentativa == MAX_TENTATIVAS_HTTP - 1 or not erro_drive_retentavel(e):
+                    raise
+            esperar_antes_de_repetir(tentativa)
+
+    def substituir_no_drive(self, file_id, conteudo, mimetype, geracao):
+        """
+        Troca o conteúdo de um arquivo já existente no Drive (mantendo id e impressão
+        digital) e anota a nova geração nas appProperties. Repetir a troca não duplica
+        nada, então toda falha retentável é simplesmente repetida. Retorna o id.
+        """
+        from googleapiclient.http import MediaIoBaseUpload
+        for tentativa in range(MAX_TENTATIVAS_HTTP):
+            try:
+                with etapa("upload_drive", bytes=len(conteudo), tentativa=tentativa + 1):
+                    media_upload = MediaIoBaseUpload(io.BytesIO(conteudo), mimetype=mimetype)
+                    arquivo = self.obter_drive_service().files().update(
+                        fileId=file_id,
+                        body={"appProperties": {"geracao": geracao}},
+                        media_body=media_upload,
+                        fields="id"
+                    ).execute()
+                    return arquivo["id"]
+            except Exception as e:
+                if tentativa == MAX_TENTATIVAS_HTTP - 1 or not erro_drive_retentavel(e):
+                    raise
+            esperar_antes_de_repetir(tentativa)
+
+    def salvar_relatorio_no_drive(self, conteudo_relatorio, periodo, chave, geracao, substituir=None):
+        """
+        Envia o relatório em texto para a pasta saida_gpt e retorna o id do arquivo.
+        A impressão digital vai nas appProperties para que outras instâncias encontrem o
+        arquivo. Com `substituir` (nova geração forçada), o relatório anterior com a mesma
+        impressão digital tem o conteúdo trocado: `substituir` é o id dele ou True para
+        procurá-lo no Drive; sem anterior, um arquivo novo é criado.
+        """
+        conteudo = conteudo_relatorio.encode('utf-8')
+        if substituir is True:
+            substituir = self.buscar_no_drive_por_impressao(pastas_ids['saida_gpt'], chave)
+        if substituir:
+            return self.substituir_no_drive(substituir, conteudo, 'text/plain', geracao)
+        nome_arquivo = f"analise_{periodo['inicio']}_a_{periodo['fim']}.txt"
+        return self.criar_no_drive(pastas_ids['saida_gpt'], nome_arquivo, conteudo, 'text/plain', chave, geracao)
+
+    def salvar_indicadores_no_drive(self, consolidados, periodo, chave):
+        """
+        Envia a planilha de indicadores consolidados (uma linha por período, com os
+        valores calculados localmente) para a planilha mestre e retorna o id do arquivo.
+        """
+        df_indicadores = pd.DataFrame({nome: [valor] for nome, valor in consolidados.items()})
+        csv_buffer = io.StringIO()
+        df_indicadores.to_csv(csv_buffer, index=False)
+        return self.criar_no_drive(pastas_ids['planilha_mestre_saida'],
+                                   f"indicadores_consolidados_{periodo['inicio']}_a_{periodo['fim']}.csv",
+                                   csv_buffer.getvalue().encode('utf-8'), 'text/csv', chave)
+
+    def enviar_zapi(self, mensagem):
+        """
+        Envia mensagem via ZAPI para WhatsApp usando o formato e headers exigidos.
+        Usa a sessão HTTP compartilhada com timeouts e retentativas; um timeout de
+        leitura não é repetido, para não duplicar a mensagem. Retorna a resposta da
+        API; erros de envio são propagados para quem chamou.
+        """
+        url = f"{self.url_zapi}/instances/{self.zapi_user}/token/{self.zapi_token}/send-text"
+        headers = {
+            "Content-Type": "application/json",
+            "client-token": self.zapi_client_token
+        }
+        payload = {
+            "phone": self.zapi_phone,
+            "message": mensagem
+        }
+        resp = self.postar_com_retentativas(url, idempotente=False, headers=headers, json=payload)
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code} - {resp.text[:200]}")
+        return resp.json()
+
+    # ---------------------- ANÁLISE COMPLETA ----------------------
+    def executar_analise(self, data_inicio, data_fim, opcoes_analise, forcar_atualizacao=False,
+                         salvar_no_drive=True, enviar_whatsapp=True,
+                         ao_notificar=None, ao_calcular=None, transmitir=None, perfil=False,
+                         mapa_reducao=False):
+        """
+        Roda todas as etapas para o período e retorna o resultado
+        {"periodo", "opcoes_analise", "indicadores", "relatorio", "chave", "mensagens_carga", "mensagens_saida", "saidas", "rastro"},
+        em que as mensagens são pares (nível, texto) com o nível do Streamlit (success, warning, ...).
+        Ganchos opcionais para a interface: `ao_notificar(nivel, texto)` recebe cada mensagem
+        quando ela surge, `ao_calcular(indicadores)` é chamado antes do GPT e
+        `transmitir(pedacos)` consome o texto do relatório e devolve o texto completo.
+        O rastro (tempo, bytes, linhas, tokens e cache por etapa) também é acrescentado
+        a ARQUIVO_RASTROS; com `perfil=True` o cProfile da execução vai para PASTA_PERFIS.
+        Com `mapa_reducao=True` o relatório é gerado em fatias paralelas (unidades,
+        convênios e análises) seguidas de um sumário executivo (ver gerar_fatias).
+        """
+        nome = f"analise {data_inicio:%Y-%m-%d} a {data_fim:%Y-%m-%d}"
+        arquivo_perfil = None
+        if perfil:
+            arquivo_perfil = os.path.join(PASTA_PERFIS, f"{datetime.now():%Y%m%d_%H%M%S}_{data_inicio:%Y%m%d}_{data_fim:%Y%m%d}.prof")
+        with rastrear(nome, ARQUIVO_RASTROS, arquivo_perfil) as rastreador:
+            analise = self._executar_etapas(
+                data_inicio, data_fim, opcoes_analise, forcar_atualizacao,
+                salvar_no_drive, enviar_whatsapp, ao_notificar, ao_calcular, transmitir, mapa_reducao
+            )
+        analise["rastro"] = rastreador.para_json()
+        return analise
+
+    def _executar_etapas(self, data_inicio, data_fim, opcoes_analise, forcar_atualizacao,
+                         salvar_no_drive, enviar_whatsapp, ao_notificar, ao_calcular, transmitir, mapa_reducao):
+        mensagens_carga = []
+        mensagens_saida = []
+
+        def notificar(mensagens, nivel, texto):
+            mensagens.append((nivel, texto))
+            if ao_notificar is not None:
+                ao_notificar(nivel, texto)
+
+        # Todas as pastas são listadas e baixadas ao mesmo tempo
+        resultados_fontes = self.carregar_fontes_em_paralelo(fontes_dados, data_inicio, data_fim)
+
+        dados = {}
+        acertos_cache = 0
+        baixados = 0
+        for fonte in fontes_dados:
+            resultado = resultados_fontes[fonte["chave"]]
+            df = resultado["df"]
+            for nome, erro in resultado["falhas"]:
+                notificar(mensagens_carga, "warning", f"⚠️ {fonte['pasta']}: \"{nome}\" não foi lido ({erro}); "
+                                                      f"as linhas desse arquivo ficam de fora até ele ser corrigido no Drive.")
+            if resultado["erro"] is not None:
+                notificar(mensagens_carga, "error", f"Erro ao ler CSV ({fonte['pasta']}): {resultado['erro']}")
+            elif df is None:
+                notificar(mensagens_carga, "warning", fonte["aviso"])
+            else:
+                acertos_cache += resultado["acertos_cache"]
+                baixados += len(resultado["arquivos"]) - resultado["acertos_cache"]
+                dados[fonte["chave"]] = df
+                # Planilha fora do esquema: avisa em vez de seguir com NaN em silêncio
+                for texto in descrever_divergencias(resultado["divergencias"]):
+                    notificar(mensagens_carga, "warning", f"⚠️ {fonte['pasta']}: {texto}")
+        notificar(mensagens_carga, "caption",
+                  f"🗄️ Cache local: {acertos_cache} planilha(s) reaproveitada(s), {baixados} baixada(s) do Drive.")
+
+        # Define o período da análise
+        periodo = {
+            "inicio": data_inicio.strftime('%Y-%m-%d'),
+            "fim": data_fim.strftime('%Y-%m-%d')
+        }
+
+        # Indicadores calculados localmente; a meta mensal é comparada com a receita do mês até o fim do período
+        producao_mes, arquivos_mes = self.producao_do_mes(data_inicio, data_fim, dados)
+        with etapa("indicadores"):
+            indicadores = calcular_indicadores(dados, periodo, self.unidades_lmg, producao_mes)
+        consolidados = indicadores["consolidados"]
+        for aviso in indicadores["avisos"]:
+            notificar(mensagens_carga, "warning", f"⚠️ {aviso}")
+        if ao_calcular is not None:
+            ao_calcular(indicadores)
+
+        # Mesmos arquivos de entrada, período e análises reaproveitam o relatório já gerado
+        arquivos_entrada = {chave: resultado["arquivos"] for chave, resultado in resultados_fontes.items()}
+        if arquivos_mes:
+            arquivos_entrada["producao_geral_mes"] = arquivos_mes
+        chave_relatorio = impressao_digital(arquivos_entrada, periodo, opcoes_analise, MODELO_GPT,
+                                            "fatias" if mapa_reducao else None, self.unidades_lmg)
+        registro_relatorio = None
+        substituir_drive = None
+        if not forcar_atualizacao:
+            with etapa("relatorio_memorizado") as registro:
+                registro_relatorio = self.obter_relatorio_memorizado(chave_relatorio)
+                registro["cache"] = registro_relatorio is not None
+        transmitir = transmitir or "".join
+
+        if registro_relatorio is not None:
+            notificar(mensagens_saida, "info",
+                      f"♻️ Relatório reaproveitado (gerado em {registro_relatorio['criado_em']}). "
+                      f"Marque \"Forçar nova geração\" para gerar outro.")
+            resposta_gpt = transmitir(iter([registro_relatorio["relatorio"]]))
+        else:
+            parciais = []
+            if mapa_reducao:
+                parciais = self.gerar_fatias(dados, periodo, opcoes_analise, indicadores, forcar_atualizacao)
+                if parciais:
+                    reaproveitadas = sum(parcial["cache"] for parcial in parciais)
+                    notificar(mensagens_saida, "caption",
+                              f"🧩 {len(parciais)} fatia(s) analisada(s) em paralelo ({reaproveitadas} reaproveitada(s)).")
+                    falhas = [parcial["titulo"] for parcial in parciais if parcial["erro"]]
+                    if falhas:
+                        notificar(mensagens_saida, "warning",
+                                  f"Fatias sem resposta do GPT: {', '.join(falhas)}. Gere de novo para repetir só estas.")
+            with etapa("montagem_prompt") as registro:
+                if parciais:
+                    mensagens_gpt = montar_consolidacao(periodo, opcoes_analise, indicadores, parciais, MODELO_GPT)
+                else:
+                    mensagens_gpt = montar_mensagens_gpt(dados, periodo, opcoes_analise, indicadores)
+                tokens_prompt = sum(contar_tokens(m["content"], MODELO_GPT) for m in mensagens_gpt)
+                registro["tokens_enviados"] = tokens_prompt
+            # O tempo da etapa inclui a exibição do texto, que acompanha a chegada dos pedaços
+            with etapa("gpt", tokens_enviados=tokens_prompt) as registro:
+                if parciais:
+                    # Sumário executivo seguido das seções das fatias, já prontas
+                    pedacos = itertools.chain(self.transmitir_gpt(mensagens_gpt, TOKENS_RESPOSTA_CONSOLIDACAO),
+                                              [anexar_parciais(parciais)])
+                else:
+                    pedacos = self.transmitir_gpt(mensagens_gpt)
+                resposta_gpt = transmitir(cronometrar_primeiro_trecho(pedacos, registro))
+                registro["tokens_recebidos"] = contar_tokens(resposta_gpt, MODELO_GPT)
+            if PREFIXO_ERRO_GPT not in resposta_gpt:
+                # Numa nova geração forçada, o relatório anterior no Drive é substituído
+                anterior = self.cache_relatorios.obter(chave_relatorio) or {}
+                substituir_drive = (anterior.get("relatorio_drive_id") or True) if forcar_atualizacao else None
+                registro_relatorio = self.cache_relatorios.gravar(
+                    chave_relatorio,
+                    relatorio=resposta_gpt,
+                    periodo=periodo,
+                    opcoes_analise=sorted(opcoes_analise),
+                    criado_em=datetime.now().isoformat(timespec="seconds"),
+                    # Identifica esta geração nos envios ao Drive (chave de idempotência)
+                    geracao=uuid.uuid4().hex,
+                    relatorio_drive_id=None
+                )
+
+        # Saídas independentes (Drive e WhatsApp) enviadas ao mesmo tempo
+        tarefas = {}
+        if salvar_no_drive:
+            if PREFIXO_ERRO_GPT in resposta_gpt:
+                # Com a impressão digital, o erro seria reaproveitado como relatório nas próximas execuções
+                notificar(mensagens_saida, "error", "Relatório não salvo no Google Drive: a resposta do GPT veio com erro.")
+            elif registro_relatorio is not None and registro_relatorio.get("relatorio_drive_id"):
+                notificar(mensagens_saida, "success", "📁 Relatório já estava salvo no Google Drive.")
+            else:
+                geracao = (registro_relatorio or {}).get("geracao") or uuid.uuid4().hex
+                tarefas["relatorio_drive"] = lambda: self.salvar_relatorio_no_drive(
+                    resposta_gpt, periodo, chave_relatorio, geracao, substituir_drive)
+            if registro_relatorio is not None and registro_relatorio.get("indicadores_drive_id"):
+                notificar(mensagens_saida, "success", "📊 Planilha de indicadores já estava atualizada.")
+            else:
+                tarefas["indicadores_drive"] = lambda: self.salvar_indicadores_no_drive(consolidados, periodo, chave_relatorio)
+        if enviar_whatsapp:
+            tarefas["whatsapp"] = lambda: self.enviar_zapi(montar_resumo_whatsapp(periodo, consolidados))
+        saidas = despachar(tarefas)
+
+        if "relatorio_drive" in saidas:
+            if saidas["relatorio_drive"]["ok"]:
+                if registro_relatorio is not None:
+                    self.cache_relatorios.gravar(chave_relatorio, relatorio_drive_id=saidas["relatorio_drive"]["resultado"])
+                notificar(mensagens_saida, "success", "📁 Relatório salvo no Google Drive.")
+            else:
+                notificar(mensagens_saida, "error", f"Erro ao salvar relatório: {saidas['relatorio_drive']['erro']}")
+        if "indicadores_drive" in saidas:
+            if saidas["indicadores_drive"]["ok"]:
+                if registro_relatorio is not None:
+                    self.cache_relatorios.gravar(chave_relatorio, indicadores_drive_id=saidas["indicadores_drive"]["resultado"])
+                notificar(mensagens_saida, "success", "📊 Planilha de indicadores consolidada atualizada.")
+            else:
+                notificar(mensagens_saida, "error", f"Erro ao atualizar planilha mestre: {saidas['indicadores_drive']['erro']}")
+        if "whatsapp" in saidas:
+            if saidas["whatsapp"]["ok"]:
+                notificar(mensagens_saida, "success", "📬 Resumo enviado via WhatsApp!")
+            else:
+                notificar(mensagens_saida, "error", f"Erro ao enviar resumo via WhatsApp: {saidas['whatsapp']['erro']}")
+
+        return {
+            "periodo": periodo,
+            "opcoes_analise": list(opcoes_analise),
+            "indicadores": indicadores,
+            "relatorio": resposta_gpt,
+            "chave": chave_relatorio,
+            "mensagens_carga": mensagens_carga,
+            "mensagens_saida": mensagens_saida,
+            # Status por destino: {"ok", "erro", "segundos"}
+            "saidas": {destino: {c: v for c, v in status.items() if c != "resultado"} for destino, status in saidas.items()},
+        }
+
+    # ---------------------- ANÁLISES PRÉ-CALCULADAS ----------------------
+    def gravar_pronto(self, tipo, analise):
+        """
+        Grava o resultado de executar_analise como análise pronta do tipo
+        (diario, semanal, mes) para a interface exibir sem recalcular. Só a mais
+        recente de cada tipo é mantida (as anteriores continuam no Drive), para que
+        listar_prontos leia poucos arquivos a cada rerun da interface.
+        """
+        periodo = analise["periodo"]
+        chave = f"{tipo}_{periodo['inicio']}_{periodo['fim']}"
+        registro = self.relatorios_prontos.gravar(
+            chave,
+            tipo=tipo,
+            gerado_em=datetime.now().isoformat(timespec="seconds"),
+            periodo=periodo,
+            opcoes_analise=analise["opcoes_analise"],
+            indicadores=indicadores_para_json(analise["indicadores"]),
+            relatorio=analise["relatorio"],
+            impressao_digital=analise["chave"],
+            mensagens_carga=analise["mensagens_carga"],
+            mensagens_saida=analise["mensagens_saida"],
+            saidas=analise["saidas"],
+            rastro=analise.get("rastro"),
+        )
+        # Fica a de período mais recente, mesmo que a gravada agora seja de um período anterior
+        do_tipo = [outra for outra in self.relatorios_prontos.chaves() if outra.startswith(f"{tipo}_")]
+        mais_recente = max(do_tipo, key=lambda outra: outra.rsplit("_", 1)[1], default=chave)
+        for outra in do_tipo:
+            if outra != mais_recente:
+                self.relatorios_prontos.remover(outra)
+        return registro
+
+    def listar_prontos(self):
+        """
+        Análises prontas, das mais recentes para as mais antigas, no formato de
+        executar_analise (com "tipo" e "gerado_em").
+        """
+        registros = []
+        for registro in self.relatorios_prontos.listar():
+            if "indicadores" not in registro:
+                continue
+            registro = dict(registro, indicadores=indicadores_de_json(registro["indicadores"]))
+            registros.append(registro)
+        return sorted(registros, key=lambda r: (r["periodo"]["fim"], r["gerado_em"]), reverse=True)
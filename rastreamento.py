@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+# ---------------------- RASTREAMENTO DAS ETAPAS ----------------------
+# Cada execução da análise tem um Rastreador; as funções do pipeline marcam as
+# suas etapas com `with etapa("download", ...)` e acrescentam métricas (bytes,
+# linhas, tokens, acerto de cache) ao registro. O rastreador da execução fica
+# num ContextVar; as tarefas enviadas a pools de threads precisam ser embrulhadas
+# com propagar() para continuar registrando no mesmo rastreador.
+# Fora de uma execução rastreada, etapa() não registra nada.
+#
+# O cProfile só enxerga a thread em que foi ligado; com um perfil pedido, cada
+# tarefa embrulhada por propagar() liga o seu próprio perfilador na thread do pool
+# e, ao terminar, entrega-o ao rastreador, que soma todos ao perfil da thread
+# principal no arquivo gravado. Os tempos ficam somados entre as threads.
+# A partir do Python 3.12 o cProfile usa o sys.monitoring, que aceita um único
+# perfilador ativo no processo: os que não puderem ser ligados são ignorados e a
+# tarefa segue só com o rastreamento das etapas (ver _ligar_perfilador).
+
+# Métricas somadas no resumo por etapa
+METRICAS_SOMADAS = ("bytes", "linhas", "tokens_enviados", "tokens_recebidos")
+
+_rastreador_atual = contextvars.ContextVar("rastreador_atual", default=None)
+_lock_arquivo = threading.Lock()
+# Indica se a thread atual já tem um perfilador ligado (só cabe um por thread)
+_perfil_da_thread = threading.local()
+
+
+class Rastreador:
+    """
+    Registros das etapas de uma execução, seguro para threads.
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.iniciado_em = datetime.now().isoformat(timespec="seconds")
+        self.segundos = None
+        self._inicio = time.perf_counter()
+        self._etapas = []
+        self._perfis = None
+        self._lock = threading.Lock()
+
+    def registrar(self, registro):
+        with self._lock:
+            self._etapas.append(registro)
+
+    def perfilando(self):
+        return self._perfis is not None
+
+    def acrescentar_perfil(self, perfilador):
+        """
+        Guarda o perfilador de uma tarefa para somá-lo ao perfil da execução; os que
+        terminam depois de o perfil ser gravado são descartados.
+        """
+        with self._lock:
+            if self._perfis is not None:
+                self._perfis.append(perfilador)
+
+    def _gravar_perfil(self, perfilador, caminho):
+        with self._lock:
+            perfis, self._perfis = self._perfis, None
+        estatisticas = pstats.Stats(perfilador)
+        for perfil in perfis:
+            estatisticas.add(perfil)
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        estatisticas.dump_stats(caminho)
+
+    def decorrido(self):
+        return time.perf_counter() - self._inicio
+
+    def etapas(self):
+        with self._lock:
+            return list(self._etapas)
+
+    def resumo(self):
+        """
+        Uma linha por etapa, na ordem da primeira ocorrência, com chamadas, tempo
+        total e máximo, métricas somadas e acertos de cache.
+        """
+        linhas = {}
+        for registro in self.etapas():
+            linha = linhas.setdefault(registro["etapa"], {
+                "etapa": registro["etapa"], "chamadas": 0, "segundos": 0.0, "segundos_max": 0.0,
+                **{metrica: 0 for metrica in METRICAS_SOMADAS}, "acertos_cache": 0, "erros": 0,
+            })
+            linha["chamadas"] += 1
+            linha["segundos"] += registro["segundos"]
+            linha["segundos_max"] = max(linha["segundos_max"], registro["segundos"])
+            for metrica in METRICAS_SOMADAS:
+                linha[metrica] += registro.get(metrica) or 0
+            linha["acertos_cache"] += int(bool(registro.get("cache")))
+            linha["erros"] += int("erro" in registro)
+        for linha in linhas.values():
+            linha["segundos"] = round(linha["segundos"], 3)
+            linha["segundos_max"] = round(linha["segundos_max"], 3)
+        return list(linhas.values())
+
+    def para_json(self):
+        return {
+            "nome": self.nome,
+            "iniciado_em": self.iniciado_em,
+            "segundos": self.segundos,
+            "resumo": self.resumo(),
+            "etapas": self.etapas(),
+        }
+
+
+def _ligar_perfilador():
+    """
+    Liga um cProfile na thread atual e retorna-o, ou None se a thread já tem um ou
+    se o interpretador recusar outro perfilador ativo (Python 3.12+).
+    """
+    if getattr(_perfil_da_thread, "ativo", False):
+        return None
+    perfilador = cProfile.Profile()
+    try:
+        perfilador.enable()
+    except ValueError:
+        return None
+    _perfil_da_thread.ativo = True
+    return perfilador
+
+
+@contextmanager
+def rastrear(nome, arquivo_log=None, arquivo_perfil=None):
+    """
+    Abre o rastreamento de uma execução. Ao final, grava o rastro como uma linha
+    JSON em `arquivo_log` e, com `arquivo_perfil`, o cProfile da execução, somando
+    a thread atual e as tarefas propagadas (abrir com `python -m pstats` ou snakeviz).
+    """
+    rastreador = Rastreador(nome)
+    token = _rastreador_atual.set(rastreador)
+    perfilador = _ligar_perfilador() if arquivo_perfil else None
+    if perfilador is not None:
+        rastreador._perfis = []
+    try:
+        yield rastreador
+    finally:
+        if perfilador is not None:
+            perfilador.disable()
+            _perfil_da_thread.ativo = False
+            rastreador._gravar_perfil(perfilador, arquivo_perfil)
+        _rastreador_atual.reset(token)
+        rastreador.segundos = round(rastreador.decorrido(), 3)
+        if arquivo_log:
+            gravar_jsonl(arquivo_log, rastreador.para_json())
+
+
+@contextmanager
+def etapa(nome, **metricas):
+    """
+    Mede o tempo de parede do bloco e registra a etapa no rastreador da execução.
+    O dicionário devolvido recebe métricas durante o bloco (registro["bytes"] = ...).
+    """
+    registro = dict(metricas)
+    rastreador = _rastreador_atual.get()
+    if rastreador is None:
+        yield registro
+        return
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    except Exception as e:
+        registro["erro"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        registro["etapa"] = nome
+        registro["inicio"] = round(inicio - rastreador._inicio, 3)
+        registro["segundos"] = round(time.perf_counter() - inicio, 4)
+        registro["thread"] = threading.current_thread().name
+        rastreador.registrar(registro)
+
+
+def propagar(funcao):
+    """
+    Embrulha a função para que, rodando em outra thread, registre as etapas no
+    rastreador da thread que a criou e, com um perfil pedido, entre no cProfile.
+    """
+    rastreador = _rastreador_atual.get()
+
+    def executar(*args, **kwargs):
+        token = _rastreador_atual.set(rastreador)
+        perfilador = _ligar_perfilador() if rastreador is not None and rastreador.perfilando() else None
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            if perfilador is not None:
+                perfilador.disable()
+                _perfil_da_thread.ativo = False
+                rastreador.acrescentar_perfil(perfilador)
+            _rastreador_atual.reset(token)
+    return executar
+
+
+def gravar_jsonl(caminho, registro):
+    """
+    Acrescenta o registro como uma linha JSON ao arquivo.
+    """
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    linha = json.dumps(registro, ensure_ascii=False, default=str)
+    with _lock_arquivo, open(caminho, "a", encoding="utf-8") as arquivo:
+        arquivo.write(linha + "\n")
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import threading
+
+from rastreamento import etapa
+
+# ---------------------- VIGIA DE MUDANÇAS DO DRIVE ----------------------
+# Em vez de listar cada pasta a cada execução só para descobrir que nada mudou,
+# o vigia acompanha o feed de mudanças do Drive (changes.list a partir de um
+# start page token guardado em disco). Cada consulta ao feed devolve, numa só
+# chamada, tudo o que mudou desde a anterior; as mudanças nos CSVs das pastas
+# vigiadas são aplicadas direto ao IndicePastas, que passa a responder sem listar
+# (ver IndicePastas.arquivos). O índice só é considerado em dia quando a sua
+# última listagem completa é posterior ao início do token (nenhuma mudança ficou
+# de fora) e o feed está em dia: com o laço em segundo plano rodando, consultado
+# há menos de VALIDADE_EM_INTERVALOS intervalos; sem ele, consultado a cada execução
+# (uma chamada em vez de uma listagem por pasta).
+#
+# Com o laço rodando, as pastas que receberam arquivos novos ou alterados ficam
+# registradas no estado até `ao_alterar` terminar sem erro (pré-carga dos CSVs,
+# recálculo dos relatórios) e são entregues de novo na consulta seguinte se ele falhar.
+
+INTERVALO_VERIFICACAO = 60  # segundos entre as consultas em segundo plano
+# A última consulta do laço vale por este número de intervalos (tolera um atraso)
+VALIDADE_EM_INTERVALOS = 2
+CAMPOS_MUDANCA = ("nextPageToken, newStartPageToken, changes(fileId, removed, "
+                  "file(id, name, mimeType, parents, trashed, modifiedTime, md5Checksum))")
+CAMPOS_ARQUIVO = ("id", "name", "modifiedTime", "md5Checksum")
+
+
+class VigiaDrive:
+    """
+    Acompanha o feed de mudanças do Drive e mantém em dia o índice das pastas vigiadas.
+    `obter_servico` devolve o cliente do Drive da thread atual; `ao_alterar`, opcional,
+    recebe {pasta_id: [arquivos novos ou alterados]} depois de cada consulta com mudanças.
+    """
+
+    def __init__(self, pasta_cache, obter_servico, indice, pastas, ao_alterar=None):
+        self.pasta_cache = pasta_cache
+        self.obter_servico = obter_servico
+        self.indice = indice
+        self.pastas = set(pastas)
+        self.ao_alterar = ao_alterar
+        self.ultimo_erro = None
+        self._lock = threading.Lock()
+        self._lock_em_dia = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._intervalo = INTERVALO_VERIFICACAO
+        self._concluido_em = None
+        os.makedirs(self.pasta_cache, exist_ok=True)
+        self._estado = self._carregar_estado()
+
+    def _caminho(self):
+        return os.path.join(self.pasta_cache, "estado.json")
+
+    def _carregar_estado(self):
+        """
+        Estado do vigia: {"token", "desde", "verificado_em", "alteradas": {pasta_id: {file_id: arquivo}}}.
+        """
+        try:
+            with open(self._caminho(), encoding="utf-8") as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return {"token": None, "desde": None, "verificado_em": None, "alteradas": {}}
+
+    def _gravar_estado(self):
+        temporario = f"{self._caminho()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(self._estado, arquivo)
+        os.replace(temporario, self._caminho())
+
+    @property
+    def desde(self):
+        """
+        Instante (time.time) a partir do qual o feed cobre todas as mudanças, ou None.
+        """
+        return self._estado["desde"]
+
+    def _iniciar_token(self):
+        # O instante é anotado antes de pedir o token: uma listagem feita depois
+        # dele não perde nenhuma mudança
+        inicio = time.time()
+        resposta = self.obter_servico().changes().getStartPageToken().execute()
+        self._estado.update(token=resposta["startPageToken"], desde=inicio, verificado_em=inicio)
+
+    def _separar(self, mudancas):
+        """
+        Agrupa as mudanças por pasta vigiada: {pasta_id: ({file_id: arquivo}, {file_ids removidos})}.
+        Arquivos apagados, na lixeira, que deixaram de ser CSV ou saíram da pasta contam como removidos.
+        """
+        por_pasta = {pasta_id: ({}, set()) for pasta_id in self.pastas}
+        for mudanca in mudancas:
+            arquivo = mudanca.get("file") or {}
+            valido = not mudanca.get("removed") and not arquivo.get("trashed") and arquivo.get("mimeType") == "text/csv"
+            for pasta_id, (alterados, removidos) in por_pasta.items():
+                if valido and pasta_id in arquivo.get("parents", []):
+                    alterados[mudanca["fileId"]] = {campo: arquivo[campo] for campo in CAMPOS_ARQUIVO if campo in arquivo}
+                    removidos.discard(mudanca["fileId"])
+                else:
+                    alterados.pop(mudanca["fileId"], None)
+                    removidos.add(mudanca["fileId"])
+        return por_pasta
+
+    def verificar(self):
+        """
+        Consulta o feed desde o último token, aplica as mudanças ao índice e retorna
+        {pasta_id: [arquivos novos ou alterados]} das pastas ainda não entregues a ao_alterar.
+        Na primeira consulta só obtém o token (o índice ainda precisa da sua listagem).
+        """
+        with self._lock:
+            with etapa("mudancas_drive") as registro:
+                if self._estado["token"] is None:
+                    self._iniciar_token()
+                    self._gravar_estado()
+                    self._concluido_em = time.time()
+                    return {}
+                inicio = time.time()
+                mudancas = []
+                token = self._estado["token"]
+                paginas = 0
+                while True:
+                    resposta = self.obter_servico().changes().list(
+                        pageToken=token,
+                        fields=CAMPOS_MUDANCA,
+                        pageSize=1000,
+                        includeRemoved=True,
+                        spaces="drive"
+                    ).execute()
+                    paginas += 1
+                    mudancas.extend(resposta.get("changes", []))
+                    if "newStartPageToken" in resposta:
+                        token = resposta["newStartPageToken"]
+                        break
+                    token = resposta["nextPageToken"]
+                registro.update(paginas=paginas, mudancas=len(mudancas))
+
+                for pasta_id, (alterados, removidos) in self._separar(mudancas).items():
+                    self.indice.aplicar_mudancas(pasta_id, list(alterados.values()), removidos)
+                    if self.ao_alterar is None:
+                        continue
+                    pendentes = self._estado["alteradas"].setdefault(pasta_id, {})
+                    for file_id in removidos:
+                        pendentes.pop(file_id, None)
+                    pendentes.update(alterados)
+                    if not pendentes:
+                        del self._estado["alteradas"][pasta_id]
+                self._estado.update(token=token, verificado_em=inicio)
+                self._gravar_estado()
+                self._concluido_em = time.time()
+                return {pasta_id: list(arquivos.values()) for pasta_id, arquivos in self._estado["alteradas"].items()}
+
+    def em_dia(self):
+        """
+        Indica se o índice pode confiar no feed. Com o laço em segundo plano rodando e
+        a última consulta recente, não faz nenhuma chamada; senão consulta o feed agora.
+        As pastas alteradas encontradas assim são entregues a ao_alterar pelo laço.
+        Falhas na consulta valem como "não".
+        """
+        pedido = time.time()
+        verificado_em = self._estado["verificado_em"]
+        if self.vigiando() and verificado_em is not None and pedido - verificado_em <= VALIDADE_EM_INTERVALOS * self._intervalo:
+            return True
+        # As pastas de uma execução perguntam ao mesmo tempo: uma consulta concluída
+        # depois do pedido serve para todas
+        with self._lock_em_dia:
+            if self._concluido_em is None or self._concluido_em < pedido:
+                try:
+                    self.verificar()
+                except Exception as e:
+                    self.ultimo_erro = e
+                    return False
+        return True
+
+    def _entregar(self, alteradas):
+        """
+        Repassa as pastas alteradas a ao_alterar e, se ele terminar sem erro, tira-as do estado.
+        """
+        if not alteradas or self.ao_alterar is None:
+            return
+        self.ao_alterar(alteradas)
+        with self._lock:
+            for pasta_id, arquivos in alteradas.items():
+                pendentes = self._estado["alteradas"].get(pasta_id, {})
+                for arquivo in arquivos:
+                    # Só sai se não mudou de novo enquanto ao_alterar rodava
+                    if pendentes.get(arquivo["id"]) == arquivo:
+                        del pendentes[arquivo["id"]]
+                if not pendentes:
+                    self._estado["alteradas"].pop(pasta_id, None)
+            self._gravar_estado()
+
+    def _laco(self, intervalo):
+        # Pendências gravadas por uma execução anterior são entregues na primeira volta
+        while not self._parar.is_set():
+            try:
+                self._entregar(self.verificar())
+                self.ultimo_erro = None
+            except Exception as e:
+                self.ultimo_erro = e
+            self._parar.wait(intervalo)
+
+    def vigiando(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self, intervalo=INTERVALO_VERIFICACAO):
+        """
+        Passa a consultar o feed em segundo plano a cada `intervalo` segundos.
+        """
+        if not self.vigiando():
+            self._intervalo = intervalo
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, args=(intervalo,), name="vigia_drive", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()